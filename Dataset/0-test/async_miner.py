@@ -0,0 +1,185 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from github_api import endpoint_class, safe_get, POOL_MAXSIZE
+import run_state
+import watermarks
+from extract import (
+    HEADERS, KEYWORDS, COMMIT_SEARCH_PER_PAGE, SEARCH_WORKERS,
+    repository_search_pages, repository_search_url, filter_new_repositories,
+    commit_search_queries, commit_search_url, parse_commit_items, unique_commits, report_saved_calls,
+    repository_tree_url, rank_repositories, commit_url_api, build_dataset_rows, valid_commit_data,
+    pending_repositories, finish_repository,
+)
+
+# ======== CONFIGURATION ========
+# Requetes simultanees par classe d'endpoint (l'API search est bien plus limitee)
+SEARCH_CONCURRENCY = 4
+CORE_CONCURRENCY = 16
+# ===============================
+
+
+async def fetch_json(url, semaphores, executor):
+    """
+    GET via le pool keep-alive de github_api, borne par le semaphore de la classe
+    d'endpoint. Renvoie None si la requete echoue ou si le statut n'est pas 200 :
+    un corps d'erreur n'est jamais pris pour une page, un arbre ou un commit vide.
+    """
+    loop = asyncio.get_running_loop()
+    async with semaphores[endpoint_class(url)]:
+        response = await loop.run_in_executor(executor, lambda: safe_get(url, headers=HEADERS))
+    if response is None or response.status_code != 200:
+        return None
+    return response.json()
+
+
+async def search_valid_repositories_async(keyword, semaphores, executor, max_pages=20, per_page=50, state=None,
+                                          pushed_since=None):
+    print(f"\n[Recherche] Recherche elargie pour : {keyword}")
+    # Decoupage des requetes (sondes total_count) dans un pool dedie, hors de la boucle d'evenements
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        pages = await loop.run_in_executor(None, repository_search_pages, keyword, pool, max_pages, per_page, pushed_since)
+    pages = [
+        (query, page) for query, page in pages
+        if state is None or not run_state.page_done(state, keyword, query, page)
+    ]
+    results = await asyncio.gather(
+        *(fetch_json(repository_search_url(query, page, per_page), semaphores, executor) for query, page in pages)
+    )
+
+    # Filtrage dans l'ordre des pages pour garder le meme dedoublonnage que la version sequentielle
+    all_repos = []
+    seen_repos = set()
+    if state is not None:
+        seen_repos = {repo["full_name"].lower() for repo in run_state.load_repositories(state, keyword)}
+    for (query, page), data in zip(pages, results):
+        if data is None:
+            continue
+        repos = filter_new_repositories(data.get("items", []), seen_repos)
+        all_repos.extend(repos)
+        if state is not None:
+            run_state.mark_page_done(state, keyword, query, page, repos)
+
+    if state is not None:
+        return run_state.load_repositories(state, keyword)
+    return all_repos
+
+
+async def search_security_commits_async(repo_full_name, semaphores, executor, max_pages=2, since=None):
+    # Premieres pages de chaque requete OR en parallele, pages suivantes seulement si la precedente est pleine.
+    # None si une page a echoue, comme search_security_commits
+    queries = commit_search_queries(since=since)
+    pages = {query: [] for query in queries}
+    pending = list(queries)
+    search_calls = 0
+    for page in range(1, max_pages + 1):
+        if not pending:
+            break
+        datas = await asyncio.gather(
+            *(fetch_json(commit_search_url(query, repo_full_name, page), semaphores, executor) for query in pending)
+        )
+        search_calls += len(pending)
+        next_pending = []
+        for query, data in zip(pending, datas):
+            if data is None or "items" not in data:
+                print(f"[Erreur] Recherche de commits incomplete pour {repo_full_name}")
+                return None
+            items = data["items"]
+            pages[query].extend(items)
+            if len(items) == COMMIT_SEARCH_PER_PAGE:
+                next_pending.append(query)
+        pending = next_pending
+
+    results = []
+    for query in queries:
+        results.extend(parse_commit_items(pages[query]))
+    results = unique_commits(results)
+    report_saved_calls(repo_full_name, results, search_calls, max_pages)
+    return results
+
+
+async def mine_repository(repo, semaphores, executor, state=None):
+    """
+    Recherche les commits de securite d'un depot puis recupere en parallele les
+    fichiers de ceux qui ne sont pas encore journalises (les autres restent a {},
+    ceux dont la requete a echoue a None). Commits None si la recherche a echoue.
+    """
+    full_name = repo["full_name"]
+    commits = await search_security_commits_async(full_name, semaphores, executor, since=repo.get("commits_since"))
+    if commits is None:
+        return None, []
+    pending = [
+        commit for commit in commits
+        if state is None or not run_state.commit_done(state, full_name, commit["sha"])
+    ]
+    datas = await asyncio.gather(
+        *(fetch_json(commit_url_api(full_name, commit["sha"]), semaphores, executor) for commit in pending)
+    )
+    fetched = {commit["sha"]: data if valid_commit_data(data) else None for commit, data in zip(pending, datas)}
+    return commits, [fetched.get(commit["sha"], {}) for commit in commits]
+
+
+async def mine_keywords(keywords, max_pages=20, search_concurrency=SEARCH_CONCURRENCY,
+                        core_concurrency=CORE_CONCURRENCY, state=None, marks=None):
+    semaphores = {
+        "search": asyncio.Semaphore(search_concurrency),
+        "core": asyncio.Semaphore(core_concurrency),
+    }
+    dataset = []
+    seen_diffs = set() if state is None else state["index"]
+
+    async def mine_tracked(repo, executor):
+        return repo, await mine_repository(repo, semaphores, executor, state)
+
+    with ThreadPoolExecutor(max_workers=min(POOL_MAXSIZE, search_concurrency + core_concurrency)) as executor:
+        for keyword in keywords:
+            started_at = watermarks.utc_timestamp()
+            pushed_since = None if marks is None else watermarks.search_since(marks, keyword)
+            repositories = await search_valid_repositories_async(
+                keyword, semaphores, executor, max_pages=max_pages, state=state, pushed_since=pushed_since
+            )
+            repositories = pending_repositories(keyword, repositories, state, marks)
+            trees = await asyncio.gather(*(
+                fetch_json(repository_tree_url(repo["full_name"], repo.get("default_branch") or "HEAD"),
+                           semaphores, executor)
+                for repo in repositories
+            ))
+            repositories = rank_repositories(repositories, trees)
+            # Filigrane de recherche avance seulement si tous les depots ont ete termines
+            complete = True
+            # Chaque depot est journalise des que son minage se termine : un arret ne perd que les depots en cours.
+            # L'ordre d'arrivee ne change que le commit retenu pour un hunk present dans plusieurs commits
+            for task in asyncio.as_completed([mine_tracked(repo, executor) for repo in repositories]):
+                repo, (commits, commit_datas) = await task
+                full_name = repo["full_name"]
+                tool = repo.get("tool_used", "Unknown")
+                if commits is None:
+                    complete = False
+                    continue
+                print(f"\n[Repository] {full_name} | Tool: {tool} | {len(commits)} commits")
+                failed = 0
+                for commit, commit_data in zip(commits, commit_datas):
+                    if state is not None and run_state.commit_done(state, full_name, commit["sha"]):
+                        continue
+                    if commit_data is None:
+                        print(f"[Erreur] Fichiers indisponibles pour {full_name}@{commit['sha']}")
+                        failed += 1
+                        continue
+                    rows = build_dataset_rows(full_name, tool, commit, commit_data, seen_diffs)
+                    if state is None:
+                        dataset.extend(rows)
+                    else:
+                        run_state.append_commit_rows(state, full_name, commit["sha"], rows, seen_diffs)
+                if failed:
+                    complete = False
+                    continue
+                finish_repository(keyword, repo, commits, state, marks)
+            if marks is not None and complete:
+                watermarks.mark_search(marks, keyword, started_at)
+    return dataset
+
+
+def mine_async(keywords=KEYWORDS, max_pages=20, search_concurrency=SEARCH_CONCURRENCY,
+               core_concurrency=CORE_CONCURRENCY, state=None, marks=None):
+    return asyncio.run(mine_keywords(keywords, max_pages, search_concurrency, core_concurrency, state, marks))
@@ -0,0 +1,103 @@
+"""
+Benchmark des moteurs asynchrone et pipeline contre le moteur sequentiel, sur un serveur HTTP
+local qui imite les endpoints GitHub utilises par extract.py (latence simulee).
+Usage : python bench_async_miner.py
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import extract
+from async_miner import mine_async
+from pipeline_miner import mine_pipeline
+
+# ======== CONFIGURATION ========
+LATENCY = 0.05          # secondes par reponse
+REPOS_PER_PAGE = 2
+COMMITS_PER_PAGE = 3
+MAX_PAGES = 2
+TOTAL_REPOS = 100      # total_count annonce : 2 pages de 50 par requete
+KEYWORDS = ["terraform"]
+# ===============================
+
+PATCH = "@@ -{line},2 +{line},2 @@\n resource \"x\" \"y\" {{\n-  insecure = true\n+  insecure = false\n"
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        page = int(params.get("page", ["1"])[0])
+        query = params.get("q", [""])[0]
+
+        if parsed.path == "/search/repositories":
+            body = {"total_count": TOTAL_REPOS, "items": [
+                {"full_name": f"owner{abs(hash(query)) % 97}-{page}/infra{i}", "name": f"infra{i}",
+                 "description": "terraform infrastructure", "topics": ["terraform"], "stargazers_count": 100,
+                 "pushed_at": "2024-01-01T00:00:00Z"}
+                for i in range(REPOS_PER_PAGE)
+            ]}
+        elif parsed.path == "/search/commits":
+            body = {"items": [
+                {"sha": f"{abs(hash(query)) % 10**6:06x}{page}{i}", "commit": {"message": f"fix {query.split()[0]}",
+                                                                      "committer": {"date": "2023-12-31T23:00:00+01:00"}}}
+                for i in range(COMMITS_PER_PAGE)
+            ]}
+        elif "/git/trees/" in parsed.path:
+            # Densite IaC variable d'un depot a l'autre, un depot sur trois sans fichier IaC
+            files = abs(hash(parsed.path)) % 3
+            body = {"truncated": False, "tree": [{"type": "blob", "path": f"mod{i}/main.tf"} for i in range(files)]}
+        else:
+            sha = parsed.path.rsplit("/", 1)[-1]
+            body = {"files": [{"filename": f"main-{sha}.tf", "patch": PATCH.format(line=int(sha[:6], 16))}]}
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        # Quota "illimité" pour mesurer le moteur et non l'ordonnanceur de github_api
+        self.send_header("X-RateLimit-Limit", "1000000")
+        self.send_header("X-RateLimit-Remaining", "1000000")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_benchmark():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGitHubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    extract.GITHUB_API = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        start = time.perf_counter()
+        rows_seq = extract.mine_sequential(KEYWORDS, max_pages=MAX_PAGES)
+        t_seq = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows_async = mine_async(KEYWORDS, max_pages=MAX_PAGES)
+        t_async = time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows_pipeline = mine_pipeline(KEYWORDS, max_pages=MAX_PAGES)
+        t_pipeline = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    print("\n=== Benchmark (serveur local, latence {:.0f} ms) ===".format(LATENCY * 1000))
+    print(f"Sequentiel : {len(rows_seq)} lignes en {t_seq:.2f}s")
+    print(f"Asynchrone : {len(rows_async)} lignes en {t_async:.2f}s (x{t_seq / t_async:.1f})")
+    print(f"Pipeline   : {len(rows_pipeline)} lignes en {t_pipeline:.2f}s (x{t_seq / t_pipeline:.1f})")
+    # Asynchrone et pipeline ecrivent dans l'ordre d'arrivee : comparaison sans tenir compte de l'ordre
+    print(f"Memes lignes (asynchrone) : {sorted(map(json.dumps, rows_seq)) == sorted(map(json.dumps, rows_async))}")
+    print(f"Memes lignes (pipeline) : {sorted(map(json.dumps, rows_seq)) == sorted(map(json.dumps, rows_pipeline))}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
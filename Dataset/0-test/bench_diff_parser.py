@@ -0,0 +1,113 @@
+"""
+Micro-benchmark de diff_parser.parse_hunks contre l'ancien extract_changed_lines.
+Les patches viennent des réponses /commits/{sha} du cache HTTP (github_cache.sqlite) ;
+à défaut, ils sont reconstruits avec difflib depuis iac_security_commits.xlsx.
+Usage : python bench_diff_parser.py
+"""
+import difflib
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from diff_parser import parse_hunks
+from github_api import CACHE_DB
+
+# ======== CONFIGURATION ========
+DATASET_XLSX = "iac_security_commits.xlsx"
+REPEAT = 5
+# ===============================
+
+
+def extract_changed_lines_legacy(patch):
+    # Version d'origine d'extract.py, conservée comme référence
+    if not patch:
+        return []
+    lines = patch.splitlines()
+    results = []
+    current_diff = None
+    before_lines, after_lines = [], []
+
+    for line in lines:
+        if line.startswith('@@'):
+            if current_diff:
+                results.append((current_diff, '\n'.join(before_lines), '\n'.join(after_lines)))
+                before_lines, after_lines = [], []
+            current_diff = line
+        elif line.startswith('-') and not line.startswith('---'):
+            before_lines.append(line[1:])
+        elif line.startswith('+') and not line.startswith('+++'):
+            after_lines.append(line[1:])
+        else:
+            before_lines.append(line)
+            after_lines.append(line)
+
+    if current_diff:
+        results.append((current_diff, '\n'.join(before_lines), '\n'.join(after_lines)))
+
+    return results
+
+
+def load_cached_patches():
+    if not os.path.exists(CACHE_DB):
+        return []
+    conn = sqlite3.connect(CACHE_DB)
+    patches = []
+    for (body,) in conn.execute("SELECT body FROM http_cache WHERE url LIKE '%/commits/%' AND status = 200"):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            patches.extend(f["patch"] for f in data.get("files", []) if f.get("patch"))
+    conn.close()
+    return patches
+
+
+def load_dataset_patches():
+    if not os.path.exists(DATASET_XLSX):
+        return []
+    df = pd.read_excel(DATASET_XLSX, usecols=["Code Before", "Code After"]).fillna("")
+    patches = []
+    for before, after in zip(df["Code Before"], df["Code After"]):
+        diff = difflib.unified_diff(str(before).splitlines(), str(after).splitlines(), lineterm="", n=3)
+        patches.append("\n".join(line for line in diff if not line.startswith(("---", "+++"))))
+    return patches
+
+
+def bench(fn, patches):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for patch in patches:
+            fn(patch)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    patches = load_cached_patches()
+    source = CACHE_DB
+    if not patches:
+        patches = load_dataset_patches()
+        source = DATASET_XLSX
+    if not patches:
+        print("[Bench] Aucun patch disponible (cache HTTP ou dataset).")
+        raise SystemExit(1)
+
+    size = sum(len(p) for p in patches)
+    print(f"[Bench] {len(patches)} patches ({size / 1e6:.1f} Mo) depuis {source}")
+
+    mismatches = sum(
+        extract_changed_lines_legacy(p) != [(h.header, h.before, h.after) for h in parse_hunks(p)]
+        for p in patches
+    )
+    t_legacy = bench(extract_changed_lines_legacy, patches)
+    t_headers = bench(lambda p: [(h.header, h.old_start, h.new_start) for h in parse_hunks(p)], patches)
+    t_full = bench(lambda p: [(h.header, h.before, h.after) for h in parse_hunks(p)], patches)
+    print(f"extract_changed_lines (ancien)      : {t_legacy * 1000:.1f} ms")
+    print(f"parse_hunks, en-tetes + plages      : {t_headers * 1000:.1f} ms (x{t_legacy / t_headers:.1f})")
+    print(f"parse_hunks, code avant/apres inclus : {t_full * 1000:.1f} ms (x{t_legacy / t_full:.1f})")
+    print(f"Sorties differentes : {mismatches}")
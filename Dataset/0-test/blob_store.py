@@ -0,0 +1,111 @@
+import base64
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+
+from github_api import safe_get
+
+# ======== CONFIGURATION ========
+# Contenus de fichiers adressés par SHA de blob git (compressés zlib), partagés par
+# extract.py (qui indexe les fichiers des commits minés) et les scripts de 2-Snyk_tests
+BLOB_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blob_store.sqlite")
+COMPRESSION_LEVEL = 6
+GITHUB_API = "https://api.github.com"
+# ===============================
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _connection():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(BLOB_DB, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (blob_sha TEXT PRIMARY KEY, size INTEGER, data BLOB);
+            CREATE TABLE IF NOT EXISTS paths (owner TEXT, repo TEXT, commit_sha TEXT, path TEXT, blob_sha TEXT,
+                                              PRIMARY KEY (owner, repo, commit_sha, path));
+        """)
+    return _conn
+
+
+def git_blob_sha(data):
+    """SHA-1 du blob git de `data` (même valeur que `git hash-object`)."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def put_blob(data, blob_sha=None):
+    blob_sha = blob_sha or git_blob_sha(data)
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)",
+            (blob_sha, len(data), zlib.compress(data, COMPRESSION_LEVEL)),
+        )
+        conn.commit()
+    return blob_sha
+
+
+def get_blob(blob_sha):
+    with _lock:
+        row = _connection().execute("SELECT data FROM blobs WHERE blob_sha = ?", (blob_sha,)).fetchone()
+    return zlib.decompress(row[0]) if row else None
+
+
+def index_paths(owner, repo, commit_sha, entries):
+    """Associe (dépôt, commit, chemin) au SHA de blob, sans contenu : entries = [(path, blob_sha)]."""
+    with _lock:
+        conn = _connection()
+        conn.executemany(
+            "INSERT OR IGNORE INTO paths VALUES (?, ?, ?, ?, ?)",
+            [(owner.lower(), repo.lower(), commit_sha, path, blob_sha) for path, blob_sha in entries],
+        )
+        conn.commit()
+
+
+def blob_sha_for(owner, repo, commit_sha, path):
+    with _lock:
+        row = _connection().execute(
+            "SELECT blob_sha FROM paths WHERE owner = ? AND repo = ? AND commit_sha = ? AND path = ?",
+            (owner.lower(), repo.lower(), commit_sha, path),
+        ).fetchone()
+    return row[0] if row else None
+
+
+def put_file(owner, repo, commit_sha, path, data, blob_sha=None):
+    blob_sha = put_blob(data, blob_sha)
+    index_paths(owner, repo, commit_sha, [(path, blob_sha)])
+    return blob_sha
+
+
+def get_file(owner, repo, commit_sha, path):
+    """Contenu du fichier au commit s'il est déjà dans le store, sinon None."""
+    blob_sha = blob_sha_for(owner, repo, commit_sha, path)
+    return get_blob(blob_sha) if blob_sha else None
+
+
+def fetch_file(owner, repo, commit_sha, path, headers):
+    """
+    Contenu du fichier au commit sans passer par l'API Contents quand son SHA
+    de blob est connu : store local, sinon un seul GET /git/blobs/{sha} par
+    version de fichier, quel que soit le nombre de commits qui la contiennent.
+    Renvoie None si le chemin n'est pas indexé ou si le blob est introuvable.
+    """
+    blob_sha = blob_sha_for(owner, repo, commit_sha, path)
+    if blob_sha is None:
+        return None
+    data = get_blob(blob_sha)
+    if data is not None:
+        return data
+    response = safe_get(f"{GITHUB_API}/repos/{owner}/{repo}/git/blobs/{blob_sha}", headers=headers)
+    if response is None or response.status_code != 200:
+        return None
+    payload = response.json()
+    if payload.get("encoding") != "base64":
+        return None
+    data = base64.b64decode(payload.get("content", ""))
+    put_blob(data, blob_sha)
+    return data
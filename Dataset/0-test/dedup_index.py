@@ -0,0 +1,53 @@
+import hashlib
+import os
+import sqlite3
+
+# ======== CONFIGURATION ========
+# Index persistant des hunks déjà minés, partagé par tous les runs
+DEDUP_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hunk_index.sqlite")
+# ===============================
+
+
+def _normalize(code):
+    # Espaces/sauts de ligne multiples ramenés à un seul espace : une ré-indentation ne crée pas un nouveau hunk
+    return " ".join(str(code).split())
+
+
+def hunk_key(repo, path, before, after):
+    """Empreinte 128 bits (BLAKE2b) de (dépôt, fichier, code avant normalisé, code après normalisé)."""
+    payload = "\x00".join((repo.lower(), path, _normalize(before), _normalize(after)))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+
+class HunkIndex:
+    """
+    Ensemble des hunks connus, adossé à SQLite (clé primaire BLOB de 16 octets).
+    Les clés ajoutées restent en attente jusqu'à commit(), pour n'être
+    enregistrées qu'une fois les lignes correspondantes écrites.
+    """
+
+    def __init__(self, path=DEDUP_DB):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS hunks (hunk_key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.conn.commit()
+        self.pending = set()
+
+    def __contains__(self, key):
+        if key in self.pending:
+            return True
+        return self.conn.execute("SELECT 1 FROM hunks WHERE hunk_key = ?", (key,)).fetchone() is not None
+
+    def add(self, key):
+        self.pending.add(key)
+
+    def add_many(self, keys):
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO hunks VALUES (?)", [(key,) for key in keys])
+
+    def commit(self):
+        self.add_many(self.pending)
+        self.pending.clear()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,110 @@
+import re
+
+_HEADER_RANGES = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# Chaque ligne du corps est vue comme "\n" + contenu : supprimer une ligne retire
+# aussi son saut de ligne, ce qui reproduit exactement '\n'.join(lignes).
+_ADDED_LINE = re.compile(r"\n\+[^\n]*")
+_REMOVED_LINE = re.compile(r"\n-[^\n]*")
+# Variantes pour les patches contenant des lignes ---/+++ (conservées des deux côtés)
+_ADDED_LINE_STRICT = re.compile(r"\n\+(?!\+\+)[^\n]*")
+_REMOVED_LINE_STRICT = re.compile(r"\n-(?!--)[^\n]*")
+_REMOVED_MARK_STRICT = re.compile(r"\n-(?!--)")
+_ADDED_MARK_STRICT = re.compile(r"\n\+(?!\+\+)")
+
+
+class Hunk:
+    """
+    Hunk d'un patch unifié : plages de l'en-tête @@ et bornes du corps dans le
+    patch d'origine. Le code avant/après n'est construit qu'au premier accès,
+    par substitution sur la tranche du corps (pas de liste de lignes).
+    """
+    __slots__ = ("header", "old_start", "old_len", "new_start", "new_len",
+                 "_patch", "_body_start", "_body_end", "_strict", "_before", "_after")
+
+    def __init__(self, header, ranges, patch, body_start, body_end, strict):
+        self.header = header
+        self.old_start, self.old_len, self.new_start, self.new_len = ranges
+        self._patch = patch
+        self._body_start = body_start
+        self._body_end = body_end
+        self._strict = strict
+        self._before = None
+        self._after = None
+
+    @property
+    def body(self):
+        # Commence par le "\n" qui suit l'en-tête (ou vide)
+        return self._patch[self._body_start:self._body_end]
+
+    @property
+    def before(self):
+        if self._before is None:
+            if self._strict:
+                self._before = _REMOVED_MARK_STRICT.sub("\n", _ADDED_LINE_STRICT.sub("", self.body))[1:]
+            else:
+                self._before = _ADDED_LINE.sub("", self.body).replace("\n-", "\n")[1:]
+        return self._before
+
+    @property
+    def after(self):
+        if self._after is None:
+            if self._strict:
+                self._after = _ADDED_MARK_STRICT.sub("\n", _REMOVED_LINE_STRICT.sub("", self.body))[1:]
+            else:
+                self._after = _REMOVED_LINE.sub("", self.body).replace("\n+", "\n")[1:]
+        return self._after
+
+    def __repr__(self):
+        return (f"Hunk({self.header!r}, old={self.old_start},{self.old_len}, "
+                f"new={self.new_start},{self.new_len})")
+
+
+def _ranges(header):
+    match = _HEADER_RANGES.match(header)
+    if not match:
+        return 0, 0, 0, 0
+    old_start, old_len, new_start, new_len = match.groups()
+    return (
+        int(old_start), int(old_len) if old_len is not None else 1,
+        int(new_start), int(new_len) if new_len is not None else 1,
+    )
+
+
+def _has_other_line_breaks(patch):
+    """Séparateurs reconnus par str.splitlines() en plus de "\n" (cas rare)."""
+    if "\r" in patch or "\x0b" in patch or "\x0c" in patch or "\x1c" in patch or "\x1d" in patch or "\x1e" in patch:
+        return True
+    return not patch.isascii() and ("\x85" in patch or "\u2028" in patch or "\u2029" in patch)
+
+
+def parse_hunks(patch):
+    """
+    Découpe un patch unifié (champ `patch` de l'API GitHub) en Hunk, avec les
+    mêmes code avant/après que l'ancien extract_changed_lines. Les lignes
+    avant le premier @@ sont ignorées.
+    """
+    if not patch:
+        return []
+    end_of_patch = len(patch) - 1 if patch.endswith("\n") else len(patch)
+    if _has_other_line_breaks(patch):
+        # splitlines() coupe aussi sur \r, \x0b... : on se ramène à des "\n"
+        patch = "\n".join(patch.splitlines())
+        end_of_patch = len(patch)
+
+    # Positions des lignes d'en-tête, trouvées avec str.find
+    starts = [0] if patch.startswith("@@") else []
+    pos = patch.find("\n@@")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = patch.find("\n@@", pos + 1)
+
+    strict = "\n---" in patch or "\n+++" in patch
+    hunks = []
+    for i, start in enumerate(starts):
+        header_end = patch.find("\n", start)
+        if header_end == -1 or header_end > end_of_patch:
+            header_end = end_of_patch
+        header = patch[start:header_end]
+        body_end = starts[i + 1] - 1 if i + 1 < len(starts) else end_of_patch
+        hunks.append(Hunk(header, _ranges(header), patch, header_end, max(header_end, body_end), strict))
+    return hunks
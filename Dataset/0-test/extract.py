@@ -1,33 +1,61 @@
-import requests
-import base64
-import pandas as pd
-import re
-import time
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
 from urllib.parse import quote
 
+from openpyxl import Workbook
+
+from github_api import safe_get, add_tokens
+import blob_store
+import run_state
+import watermarks
+from diff_parser import parse_hunks
+from dedup_index import hunk_key
+
 # ======== CONFIGURATION ========
 GITHUB_TOKEN = "xxx"
 HEADERS = {
     "Authorization": f"token {GITHUB_TOKEN}",
     "Accept": "application/vnd.github.cloak-preview"
 }
+# Jetons supplémentaires : GITHUB_TOKENS ou github_tokens.txt (voir github_api)
+add_tokens([GITHUB_TOKEN])
+GITHUB_API = "https://api.github.com"
 KEYWORDS = ["terraform", "ansible", "puppet"]
 EXCLUDE_PATTERNS = ["module", "role", "plugin", "ansible/ansible", "puppetlabs/puppet", "hashicorp/terraform"]
+EXCLUDE_DESCRIPTIONS = ["example", "sample", "test", "learn", "tutorial", "demo", "education"]
+COMMIT_PATTERNS = ["CVE-", "security", "vulnerability", "exploit", "patch"]
+# Motifs combines en requetes OR (limite GitHub : 5 operateurs AND/OR/NOT par requete)
+MAX_QUERY_OPERATORS = 5
+# La recherche GitHub s'arrete a 1000 resultats par requete : les requetes de depots
+# sont decoupees par etoiles puis par date de creation jusqu'a passer sous ce plafond
+SEARCH_RESULT_CAP = 1000
+MIN_STARS = 31
+SEARCH_START_DATE = date(2008, 1, 1)
+SEARCH_WORKERS = 4
+COMMIT_SEARCH_PER_PAGE = 100
+IAC_EXTENSIONS = (".tf", ".pp", ".yml", ".yaml")
+# Tri des depots avant la recherche de commits : un listing de l'arbre a HEAD par depot,
+# les depots sans fichier IaC sont ecartes, les plus denses sont mines en premier
+IAC_TOOL_BY_EXTENSION = {".tf": "Terraform", ".pp": "Puppet", ".yml": "Ansible", ".yaml": "Ansible"}
+# Un YAML ne compte pour Ansible que sous un de ces segments de chemin (ou un nom contenant "playbook") :
+# workflows CI, docker-compose.yml, etc. ne font ni passer le tri ni etiqueter le depot Ansible
+ANSIBLE_PATH_SEGMENTS = ("roles", "tasks", "handlers", "playbooks", "group_vars", "host_vars")
+IGNORED_TREE_PREFIXES = (".github/",)
+MIN_IAC_FILES = 1
+OUTPUT_FILE = "iac_security_commits.xlsx"
+# Journal + lignes en JSONL : un run interrompu reprend là où il s'est arrêté
+RUN_DIR = run_state.RUN_DIR
+# Moteur de minage : "sequential" (historique), "async" (voir async_miner.py),
+# "pipeline" (etapes en threads reliees par des files bornees, voir pipeline_miner.py)
+# ou "git" (clones partiels locaux au lieu de la recherche de commits, voir git_miner.py)
+MINING_MODE = "sequential"
+# Mode incremental (voir watermarks.py) : seuls les depots pousses et les commits
+# posterieurs au dernier minage sont demandes ; export dans un fichier date
+INCREMENTAL = False
 # ===============================
 
-def safe_get(url, headers, retries=3, delay=5):
-    for attempt in range(1, retries + 1):
-        try:
-            response = requests.get(url, headers=headers, timeout=(10, 60))
-            return response
-        except requests.exceptions.ReadTimeout as e:
-            print(f"[Timeout] Lecture en attente (tentative {attempt}/{retries}) -> {url}")
-        except requests.exceptions.ConnectionError as e:
-            print(f"[Erreur] Connexion echouee ({attempt}/{retries}) : {e}")
-        time.sleep(delay)
-    print(f"[Erreur] Echec definitif apres {retries} tentatives : {url}")
-    return None
-
 def detect_iac_tool(repo):
     name = repo["name"].lower()
     desc = (repo.get("description") or "").lower()
@@ -43,141 +71,481 @@ def detect_iac_tool(repo):
     return "Unknown"
     
 
-def search_valid_repositories(keyword, max_pages=20, per_page=50, delay=3):
-    print(f"\n[Recherche] Recherche elargie pour : {keyword}")
-    all_repos = []
-    seen_repos = set()
-
-    search_queries = [
+def repository_search_queries(keyword, pushed_since=None):
+    queries = [
         f"topic:{keyword}",
         f'"using {keyword}" in:description',
         f'"Infrastructure as Code" in:description',
     ]
+    if pushed_since is not None:
+        # Mode incremental : seuls les depots pousses depuis la derniere recherche
+        queries = [f"{query} pushed:>{pushed_since}" for query in queries]
+    return queries
 
-    for query in search_queries:
-        for page in range(1, max_pages + 1):
-            url = f"https://api.github.com/search/repositories?q={quote(query)}+stars:>30&sort=stars&order=desc&per_page={per_page}&page={page}"
-            response = safe_get(url, headers=HEADERS)
-            if response is None:
-                break
+def repository_search_url(query, page, per_page=50):
+    return f"{GITHUB_API}/search/repositories?q={quote(query)}&sort=stars&order=desc&per_page={per_page}&page={page}"
 
-            repos = response.json().get("items", [])
-            for repo in repos:
-                full_name = repo["full_name"].lower()
-                description = (repo.get("description") or "").lower()
+def slice_query(query, min_stars, max_stars=None, created=None):
+    """Requete restreinte a une tranche d'etoiles (max_stars=None : sans borne haute) et de dates de creation."""
+    stars = f"stars:>={min_stars}" if max_stars is None else f"stars:{min_stars}..{max_stars}"
+    if created is None:
+        return f"{query} {stars}"
+    return f"{query} {stars} created:{created[0].isoformat()}..{created[1].isoformat()}"
 
-                if full_name in seen_repos:
-                    continue
-                if any(excl in full_name for excl in EXCLUDE_PATTERNS):
-                    continue
-                if any(bad in description for bad in ["example", "sample", "test", "learn", "tutorial", "demo", "education"]):
-                    continue
+def probe_repository_query(query):
+    """
+    (total_count, etoiles du premier resultat) pour une requete, avec une seule
+    requete d'un resultat. None si la sonde a echoue (None, 403, 422, 5xx).
+    """
+    response = safe_get(repository_search_url(query, 1, per_page=1), headers=HEADERS)
+    if response is None or response.status_code != 200:
+        return None
+    data = response.json()
+    items = data.get("items", [])
+    return data.get("total_count", 0), (items[0].get("stargazers_count", 0) if items else 0)
+
+def partition_repository_query(query, pool):
+    """
+    Decoupe `query` en tranches de moins de SEARCH_RESULT_CAP resultats :
+    bisection sur les etoiles, puis sur la date de creation quand une tranche
+    ne couvre plus qu'un nombre d'etoiles. Les tranches d'un meme niveau sont
+    sondees en parallele. Une tranche dont la sonde echoue est gardee entiere,
+    avec SEARCH_RESULT_CAP comme total. Renvoie [(requete, total_count)] par
+    etoiles decroissantes.
+    """
+    slices = []
+    level = [(MIN_STARS, None, None)]
+    while level:
+        probes = list(pool.map(lambda s: probe_repository_query(slice_query(query, *s)), level))
+        next_level = []
+        for (low, high, created), probe in zip(level, probes):
+            if probe is None:
+                # Total inconnu : toutes les pages de la tranche seront demandees plutot que de la perdre
+                start = created[0] if created else SEARCH_START_DATE
+                top = low if high is None else high
+                print(f"[Recherche] Sonde en echec, tranche gardee sans decoupage : "
+                      f"{slice_query(query, low, high, created)}")
+                slices.append(((-top, -start.toordinal()), slice_query(query, low, high, created), SEARCH_RESULT_CAP))
+                continue
+            if probe[0] == 0:
+                continue
+            total, top_stars = probe
+            start, end = created or (SEARCH_START_DATE, date.today())
+            top = top_stars if high is None else high
+            if total <= SEARCH_RESULT_CAP:
+                slices.append(((-top, -start.toordinal()), slice_query(query, low, high, created), total))
+            elif low < top:
+                middle = (low + top) // 2
+                next_level += [(low, middle, created), (middle + 1, high, created)]
+            elif start < end:
+                middle = start + (end - start) // 2
+                next_level += [(low, top, (start, middle)), (low, top, (middle + timedelta(days=1), end))]
+            else:
+                print(f"[Recherche] Tranche indivisible tronquee a {SEARCH_RESULT_CAP} resultats : "
+                      f"{slice_query(query, low, high, created)} ({total})")
+                slices.append(((-top, -start.toordinal()), slice_query(query, low, high, created), total))
+        level = next_level
+    return [(sliced, total) for _, sliced, total in sorted(slices)]
+
+def repository_search_pages(keyword, pool, max_pages=20, per_page=50, pushed_since=None):
+    """
+    Pages a recuperer pour un mot-cle : [(requete de tranche, page)]. Le nombre
+    de pages vient du total_count de chaque tranche, aucune page vide n'est demandee.
+    """
+    pages = []
+    for query in repository_search_queries(keyword, pushed_since):
+        for sliced, total in partition_repository_query(query, pool):
+            page_count = min(max_pages, -(-min(total, SEARCH_RESULT_CAP) // per_page))
+            pages.extend((sliced, page) for page in range(1, page_count + 1))
+    return pages
+
+def filter_new_repositories(repos, seen_repos):
+    """
+    Filtre une page de resultats de recherche de depots (doublons, exclusions)
+    et annote chaque depot retenu avec l'outil IaC detecte.
+    """
+    kept = []
+    for repo in repos:
+        full_name = repo["full_name"].lower()
+        description = (repo.get("description") or "").lower()
 
-                repo["tool_used"] = detect_iac_tool(repo)
-                seen_repos.add(full_name)
-                all_repos.append(repo)
+        if full_name in seen_repos:
+            continue
+        if any(excl in full_name for excl in EXCLUDE_PATTERNS):
+            continue
+        if any(bad in description for bad in EXCLUDE_DESCRIPTIONS):
+            continue
 
-            time.sleep(delay)
+        repo["tool_used"] = detect_iac_tool(repo)
+        seen_repos.add(full_name)
+        kept.append(repo)
+    return kept
+
+def repository_tree_url(full_name, ref="HEAD"):
+    return f"{GITHUB_API}/repos/{full_name}/git/trees/{quote(ref, safe='')}?recursive=1"
+
+def is_ansible_path(path):
+    """Chemin d'un YAML Ansible : segment roles/, tasks/... ou nom de fichier contenant "playbook"."""
+    *directories, filename = path.lower().split("/")
+    return any(segment in ANSIBLE_PATH_SEGMENTS for segment in directories) or "playbook" in filename
+
+def count_iac_files(tree_data):
+    """Nombre de fichiers par extension IaC dans un listing /git/trees recursif."""
+    counts = {}
+    for entry in tree_data.get("tree", []):
+        path = entry.get("path", "")
+        if entry.get("type") != "blob" or path.startswith(IGNORED_TREE_PREFIXES):
+            continue
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in IAC_EXTENSIONS:
+            continue
+        if IAC_TOOL_BY_EXTENSION.get(extension) == "Ansible" and not is_ansible_path(path):
+            continue
+        counts[extension] = counts.get(extension, 0) + 1
+    return counts
+
+def rank_repositories(repositories, trees):
+    """
+    File de priorite par rendement attendu (nombre de fichiers IaC a HEAD).
+    Un depot dont l'arbre n'a pas pu etre liste est garde en fin de file ;
+    un arbre complet sans fichier IaC est ecarte. A egalite, ordre de la recherche.
+    """
+    queue = []
+    for index, (repo, tree) in enumerate(zip(repositories, trees)):
+        if tree is None:
+            heapq.heappush(queue, (1, index, repo))
+            continue
+        counts = count_iac_files(tree)
+        total = sum(counts.values())
+        if total < MIN_IAC_FILES and not tree.get("truncated"):
+            print(f"[Tri] {repo['full_name']} ecarte : aucun fichier IaC a HEAD")
+            continue
+        repo["iac_files"] = total
+        if repo.get("tool_used", "Unknown") == "Unknown" and counts:
+            extension = max(counts, key=counts.get)
+            repo["tool_used"] = IAC_TOOL_BY_EXTENSION[extension]
+        heapq.heappush(queue, (-total, index, repo))
+    return [heapq.heappop(queue)[2] for _ in range(len(queue))]
+
+def fetch_repository_tree(repo):
+    """Listing recursif de l'arbre a HEAD, ou None (depot garde en fin de file) si la requete a echoue."""
+    response = safe_get(repository_tree_url(repo["full_name"], repo.get("default_branch") or "HEAD"), headers=HEADERS)
+    if response is None or response.status_code != 200:
+        return None
+    return response.json()
+
+def prioritize_repositories(repositories):
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        trees = list(pool.map(fetch_repository_tree, repositories))
+    ranked = rank_repositories(repositories, trees)
+    print(f"[Tri] {len(ranked)}/{len(repositories)} depots retenus apres sondage de l'arbre")
+    return ranked
+
+def apply_watermarks(repositories, marks):
+    """
+    Mode incremental : ecarte les depots dont pushed_at n'a pas bouge depuis le
+    dernier minage et note dans `commits_since` la date du dernier commit mine.
+    """
+    kept = []
+    for repo in repositories:
+        watermark = watermarks.repo_watermark(marks, repo["full_name"])
+        if watermark is not None:
+            pushed_at, last_commit_date = watermark
+            if pushed_at and pushed_at == repo.get("pushed_at"):
+                continue
+            repo["commits_since"] = last_commit_date
+        kept.append(repo)
+    print(f"[Incremental] {len(kept)}/{len(repositories)} depots pousses depuis le dernier minage")
+    return kept
+
+def search_valid_repositories(keyword, max_pages=20, per_page=50, state=None, pushed_since=None):
+    print(f"\n[Recherche] Recherche elargie pour : {keyword}")
+    all_repos = []
+    seen_repos = set()
+    if state is not None:
+        seen_repos = {repo["full_name"].lower() for repo in run_state.load_repositories(state, keyword)}
+
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        pages = [
+            (query, page) for query, page in repository_search_pages(keyword, pool, max_pages, per_page, pushed_since)
+            if state is None or not run_state.page_done(state, keyword, query, page)
+        ]
+        print(f"[Recherche] {len(pages)} pages a recuperer pour : {keyword}")
+        responses = pool.map(
+            lambda query_page: safe_get(repository_search_url(query_page[0], query_page[1], per_page), headers=HEADERS),
+            pages,
+        )
+
+        # Filtrage dans l'ordre des pages : le dedoublonnage ne depend pas de l'ordre d'arrivee
+        for (query, page), response in zip(pages, responses):
+            # Page en echec (None, 403, 422, 5xx) : non journalisee, elle sera redemandee a la reprise
+            if response is None or response.status_code != 200:
+                continue
+            repos = filter_new_repositories(response.json().get("items", []), seen_repos)
+            all_repos.extend(repos)
+            if state is not None:
+                run_state.mark_page_done(state, keyword, query, page, repos)
+
+    if state is not None:
+        # Inclut les depots trouves lors des runs precedents, dans l'ordre d'origine
+        return run_state.load_repositories(state, keyword)
     return all_repos
 
-def search_security_commits(repo_full_name, max_pages=2):
+def commit_search_queries(patterns=COMMIT_PATTERNS, since=None):
+    """
+    Regroupe les motifs en requetes OR : GitHub accepte au plus
+    MAX_QUERY_OPERATORS operateurs par requete, soit 6 motifs. Avec `since`,
+    seuls les commits posterieurs au filigrane du depot sont demandes.
+    """
+    size = MAX_QUERY_OPERATORS + 1
+    queries = [
+        " OR ".join(f'"{pattern}"' for pattern in patterns[i:i + size])
+        for i in range(0, len(patterns), size)
+    ]
+    if since is not None:
+        queries = [f"{query} committer-date:>{since}" for query in queries]
+    return queries
+
+def commit_search_url(query, repo_full_name, page, per_page=COMMIT_SEARCH_PER_PAGE):
+    return f"{GITHUB_API}/search/commits?q={quote(query)}+repo:{repo_full_name}&per_page={per_page}&page={page}"
+
+def parse_commit_items(items):
+    return [
+        {
+            "sha": item["sha"],
+            "message": item["commit"]["message"],
+            "date": (item["commit"].get("committer") or {}).get("date"),
+            "type": "CVE" if "CVE-" in item["commit"]["message"] else "Security"
+        }
+        for item in items
+    ]
+
+def unique_commits(commits):
+    """Premier exemplaire de chaque SHA, dans l'ordre des resultats."""
+    seen = set()
+    unique = []
+    for commit in commits:
+        if commit["sha"] not in seen:
+            seen.add(commit["sha"])
+            unique.append(commit)
+    return unique
+
+def report_saved_calls(repo_full_name, commits, search_calls, max_pages=2):
+    """
+    Compare au schema d'origine (max_pages recherches par motif, puis un
+    /commits/{sha} par resultat) : un commit dont le message contient
+    plusieurs motifs y etait renvoye, et telecharge, une fois par motif.
+    """
+    legacy_calls = len(COMMIT_PATTERNS) * max_pages
+    for commit in commits:
+        message = commit["message"].lower()
+        legacy_calls += max(1, sum(pattern.lower() in message for pattern in COMMIT_PATTERNS))
+    saved = legacy_calls - (search_calls + len(commits))
+    print(f"[Commits] {repo_full_name} : {len(commits)} commits uniques, "
+          f"{search_calls} recherches, ~{saved} appels API economises")
+    return saved
+
+def search_security_commits(repo_full_name, max_pages=2, since=None):
+    """
+    Commits de securite du depot, ou None si une page de recherche a echoue :
+    la liste serait incomplete, le depot ne doit pas etre marque termine.
+    """
     results = []
-    patterns = ["CVE-", "security", "vulnerability", "exploit", "patch"]
-    for pattern in patterns:
+    search_calls = 0
+    failed = False
+    for query in commit_search_queries(since=since):
         for page in range(1, max_pages + 1):
-            url = f"https://api.github.com/search/commits?q={quote(pattern)}+repo:{repo_full_name}&per_page=20&page={page}"
+            url = commit_search_url(query, repo_full_name, page)
             response = safe_get(url, headers=HEADERS)
-            if response is None:
-                continue
+            search_calls += 1
+            if response is None or response.status_code != 200:
+                failed = True
+                break
             items = response.json().get("items", [])
-            for item in items:
-                commit = {
-                    "sha": item["sha"],
-                    "message": item["commit"]["message"],
-                    "type": "CVE" if "CVE-" in item["commit"]["message"] else "Security"
-                }
-                results.append(commit)
+            results.extend(parse_commit_items(items))
+            if len(items) < COMMIT_SEARCH_PER_PAGE:
+                break  # derniere page atteinte
+    if failed:
+        print(f"[Erreur] Recherche de commits incomplete pour {repo_full_name}")
+        return None
+    results = unique_commits(results)
+    report_saved_calls(repo_full_name, results, search_calls, max_pages)
     return results
 
+def commit_url_api(repo_full_name, sha):
+    return f"{GITHUB_API}/repos/{repo_full_name}/commits/{sha}"
+
+def valid_commit_data(data):
+    """Reponse /commits/{sha} exploitable : seul un commit complet est journalise."""
+    return isinstance(data, dict) and "files" in data
+
 def get_commit_files(repo_full_name, sha):
-    url = f"https://api.github.com/repos/{repo_full_name}/commits/{sha}"
-    response = safe_get(url, headers=HEADERS)
-    if response is None:
-        return {}
-    return response.json()
+    """Reponse /commits/{sha}, ou None si la requete a echoue (le commit sera retente au prochain run)."""
+    response = safe_get(commit_url_api(repo_full_name, sha), headers=HEADERS)
+    if response is None or response.status_code != 200:
+        return None
+    data = response.json()
+    return data if valid_commit_data(data) else None
 
 def extract_changed_lines(patch):
-    if not patch:
-        return []
-    lines = patch.splitlines()
-    results = []
-    current_diff = None
-    before_lines, after_lines = [], []
-
-    for line in lines:
-        if line.startswith('@@'):
-            if current_diff:
-                results.append((current_diff, '\n'.join(before_lines), '\n'.join(after_lines)))
-                before_lines, after_lines = [], []
-            current_diff = line
-        elif line.startswith('-') and not line.startswith('---'):
-            before_lines.append(line[1:])
-        elif line.startswith('+') and not line.startswith('+++'):
-            after_lines.append(line[1:])
-        else:
-            before_lines.append(line)
-            after_lines.append(line)
+    """Ancienne interface : (en-tete @@, code avant, code apres) par hunk. Voir diff_parser.parse_hunks."""
+    return [(hunk.header, hunk.before, hunk.after) for hunk in parse_hunks(patch)]
 
-    if current_diff:
-        results.append((current_diff, '\n'.join(before_lines), '\n'.join(after_lines)))
+def build_dataset_rows(full_name, tool, commit, commit_data, seen_diffs):
+    """
+    Construit les lignes du dataset pour un commit a partir de sa reponse
+    /repos/{repo}/commits/{sha}. Partage par les moteurs sequentiel et asynchrone.
+    """
+    sha = commit["sha"]
+    commit_url = f"https://github.com/{full_name}/commit/{sha}"
+    rows = []
 
-    return results
+    # Version apres commit de chaque fichier, pour les scripts d'extraction de snippets (blob_store)
+    owner, repo_name = full_name.split("/", 1)
+    blob_store.index_paths(owner, repo_name, sha, [
+        (file["filename"], file["sha"])
+        for file in commit_data.get("files", [])
+        if file.get("sha") and file.get("filename") and file.get("status") != "removed"
+    ])
 
-# === MAIN SCRIPT ===
-dataset = []
-seen_diffs = set()
+    for file in commit_data.get("files", []):
+        filepath = file.get("filename", "")
+        patch = file.get("patch", "")
+        if not patch or not filepath.endswith(IAC_EXTENSIONS):
+            continue
 
-for keyword in KEYWORDS:
-    repositories = search_valid_repositories(keyword)
+        for hunk in parse_hunks(patch):
+            # Clé de contenu : un même hunk revu dans un autre commit (cherry-pick, merge) est ignoré
+            key = hunk_key(full_name, filepath, hunk.before, hunk.after)
+            if key in seen_diffs:
+                continue
+            seen_diffs.add(key)
 
-    for repo in repositories:
-        full_name = repo["full_name"]
-        tool = repo.get("tool_used", "Unknown")
-        print(f"\n[Repository] {full_name} | Tool: {tool}")
-
-        security_commits = search_security_commits(full_name)
-        for commit in security_commits:
-            sha = commit["sha"]
-            message = commit["message"]
-            commit_type = commit["type"]
-            commit_url = f"https://github.com/{full_name}/commit/{sha}"
-
-            commit_data = get_commit_files(full_name, sha)
-            files = commit_data.get("files", [])
-
-            for file in files:
-                filepath = file.get("filename", "")
-                patch = file.get("patch", "")
-                if not patch or not filepath.endswith((".tf", ".pp", ".yml", ".yaml")):
+            rows.append({
+                "Commit URL": commit_url,
+                "Filepath": filepath,
+                "Diff": hunk.header,
+                "Previous Lines": f"{hunk.old_start},{hunk.old_len}",
+                "After Lines": f"{hunk.new_start},{hunk.new_len}",
+                "Code Before": hunk.before,
+                "Code After": hunk.after,
+                "Commit Message": commit["message"],
+                "Tool Used": tool
+            })
+    return rows
+
+def pending_repositories(keyword, repositories, state=None, marks=None):
+    """Depots restant a miner : ni termines dans le run, ni inchanges depuis leur filigrane."""
+    if state is not None:
+        repositories = [repo for repo in repositories if not run_state.repo_done(state, keyword, repo["full_name"])]
+    if marks is not None:
+        repositories = apply_watermarks(repositories, marks)
+    return repositories
+
+def finish_repository(keyword, repo, commits, state=None, marks=None):
+    """Avance le filigrane du depot puis le marque termine dans le journal du run."""
+    if marks is not None:
+        watermarks.mark_repo(marks, repo["full_name"], repo.get("pushed_at"), [commit["date"] for commit in commits])
+    if state is not None:
+        run_state.mark_repo_done(state, keyword, repo["full_name"])
+
+def mine_sequential(keywords=KEYWORDS, max_pages=20, state=None, marks=None):
+    """
+    Sans `state`, renvoie la liste des lignes. Avec un run ouvert par
+    run_state.open_run, les lignes sont ecrites au fil de l'eau dans le JSONL
+    du run et les pages/depots/commits deja traites sont sautes. Avec `marks`
+    (watermarks.open_watermarks), seuls les depots et commits posterieurs au
+    dernier minage sont demandes.
+    """
+    dataset = []
+    seen_diffs = set() if state is None else state["index"]
+
+    for keyword in keywords:
+        started_at = watermarks.utc_timestamp()
+        pushed_since = None if marks is None else watermarks.search_since(marks, keyword)
+        repositories = search_valid_repositories(keyword, max_pages=max_pages, state=state, pushed_since=pushed_since)
+        repositories = prioritize_repositories(pending_repositories(keyword, repositories, state, marks))
+        # Filigrane de recherche avance seulement si tous les depots ont ete termines
+        complete = True
+
+        for repo in repositories:
+            full_name = repo["full_name"]
+            tool = repo.get("tool_used", "Unknown")
+            print(f"\n[Repository] {full_name} | Tool: {tool} | {repo.get('iac_files', '?')} fichiers IaC")
+
+            security_commits = search_security_commits(full_name, since=repo.get("commits_since"))
+            if security_commits is None:
+                complete = False
+                continue
+            failed = 0
+            for commit in security_commits:
+                if state is not None and run_state.commit_done(state, full_name, commit["sha"]):
                     continue
+                commit_data = get_commit_files(full_name, commit["sha"])
+                if commit_data is None:
+                    print(f"[Erreur] Fichiers indisponibles pour {full_name}@{commit['sha']}")
+                    failed += 1
+                    continue
+                rows = build_dataset_rows(full_name, tool, commit, commit_data, seen_diffs)
+                if state is None:
+                    dataset.extend(rows)
+                else:
+                    run_state.append_commit_rows(state, full_name, commit["sha"], rows, seen_diffs)
+
+            # Un commit en echec garde le depot ouvert : il sera retente au prochain run
+            if failed:
+                complete = False
+                continue
+            finish_repository(keyword, repo, security_commits, state, marks)
+        if marks is not None and complete:
+            watermarks.mark_search(marks, keyword, started_at)
+    return dataset
+
+def export_dataset(dataset, output_file=OUTPUT_FILE):
+    """
+    Ecrit les lignes (liste ou generateur, ex. run_state.iter_rows) dans un
+    classeur openpyxl en ecriture seule : le dataset n'est jamais charge en memoire.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    columns = None
+    count = 0
+    for row in dataset:
+        if columns is None:
+            columns = list(row)
+            sheet.append(columns)
+        sheet.append([row.get(column) for column in columns])
+        count += 1
+    workbook.save(output_file)
+    print(f"\n[Export] {count} entrees enregistrees dans {output_file}")
+
+# === MAIN SCRIPT ===
+if __name__ == "__main__":
+    run_dir, output_file, marks = RUN_DIR, OUTPUT_FILE, None
+    if INCREMENTAL:
+        # Un run et un export par rafraichissement : seules les nouvelles lignes y figurent
+        marks = watermarks.open_watermarks()
+        suffix = date.today().isoformat()
+        run_dir = f"{RUN_DIR}-{suffix}"
+        output_file = OUTPUT_FILE.replace(".xlsx", f"-{suffix}.xlsx")
+
+    state = run_state.open_run(run_dir)
+    try:
+        if MINING_MODE == "async":
+            from async_miner import mine_async
+            mine_async(KEYWORDS, state=state, marks=marks)
+        elif MINING_MODE == "pipeline":
+            from pipeline_miner import mine_pipeline
+            mine_pipeline(KEYWORDS, state=state, marks=marks)
+        elif MINING_MODE == "git":
+            from git_miner import mine_git
+            mine_git(KEYWORDS, state=state, marks=marks)
+        else:
+            mine_sequential(KEYWORDS, state=state, marks=marks)
 
-                blocks = extract_changed_lines(patch)
-                for diff_header, code_before, code_after in blocks:
-                    if diff_header in seen_diffs:
-                        continue
-                    seen_diffs.add(diff_header)
-
-                    dataset.append({
-                        "Commit URL": commit_url,
-                        "Filepath": filepath,
-                        "Diff": diff_header,
-                        "Code Before": code_before,
-                        "Code After": code_after,
-                        "Commit Message": message,
-                        "Tool Used": tool
-                    })
-
-# === EXPORT ===
-df = pd.DataFrame(dataset)
-df.to_excel("iac_security_commits.xlsx", index=False)
-print(f"\n[Export] {len(df)} entrees enregistrees dans iac_security_commits.xlsx")
+        # === EXPORT ===
+        export_dataset(run_state.iter_rows(state), output_file)
+    finally:
+        run_state.close_run(state)
+        if marks is not None:
+            marks.close()
@@ -0,0 +1,173 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import run_state
+import watermarks
+from extract import (
+    KEYWORDS, COMMIT_PATTERNS, IAC_EXTENSIONS,
+    search_valid_repositories, prioritize_repositories, parse_commit_items, build_dataset_rows,
+    pending_repositories, finish_repository,
+)
+
+# ======== CONFIGURATION ========
+# Clones partiels (--filter=blob:none) : seuls les blobs des fichiers IaC modifiés sont téléchargés
+CLONE_DIR = "git_clones"
+GIT_WORKERS = 4
+# Même plafond que l'API : 2 pages de 100 résultats de la requête OR (None = tous les commits)
+MAX_COMMITS = 200
+GIT_TIMEOUT = 1800
+# ===============================
+
+GIT_PATH = shutil.which("git")
+
+
+def run_git(args, cwd=None):
+    result = subprocess.run(
+        [GIT_PATH, "-c", "core.quotePath=false"] + args, cwd=cwd,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=GIT_TIMEOUT,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", errors="ignore").strip())
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def ensure_partial_clone(full_name, clone_dir=CLONE_DIR):
+    """Clone bare + blobless du dépôt, ou mise à jour des branches s'il existe déjà."""
+    path = os.path.join(clone_dir, full_name.replace("/", "__"))
+    if os.path.isdir(path):
+        run_git(["fetch", "--quiet", "--filter=blob:none", "origin", "+refs/heads/*:refs/heads/*"], cwd=path)
+    else:
+        os.makedirs(clone_dir, exist_ok=True)
+        run_git(["clone", "--quiet", "--bare", "--filter=blob:none", f"https://github.com/{full_name}.git", path])
+    return path
+
+
+def search_security_commits_git(repo_path, max_commits=MAX_COMMITS, since=None):
+    """
+    Équivalent local de search_security_commits : un seul `git log` avec un
+    --grep par motif (combinés en OU, insensibles à la casse), chaque commit
+    n'apparaît donc qu'une fois. `since` : filigrane du mode incrémental.
+    """
+    args = ["log", "HEAD", "-i", "-F"] + [f"--grep={pattern}" for pattern in COMMIT_PATTERNS]
+    args.append("--format=%H%x00%cI%x00%B%x1e")
+    if since is not None:
+        args.append(f"--since={since}")
+    if max_commits is not None:
+        args.append(f"--max-count={max_commits}")
+    items = []
+    for record in run_git(args, cwd=repo_path).split("\x1e"):
+        record = record.strip("\n")
+        if not record:
+            continue
+        sha, committed_at, message = record.split("\x00", 2)
+        items.append({"sha": sha, "commit": {"message": message.rstrip("\n"), "committer": {"date": committed_at}}})
+    return parse_commit_items(items)
+
+
+def split_patch_by_file(show_output):
+    """
+    Découpe la sortie de `git show` en entrées au format de l'API
+    (/repos/{repo}/commits/{sha} -> files[].filename/patch) : le patch commence
+    au premier en-tête @@, sans les lignes diff/index/---/+++.
+    """
+    files = []
+    for section in show_output.split("\ndiff --git "):
+        if not section.strip():
+            continue
+        lines = section.split("\n")
+        filename = None
+        hunk_start = None
+        for i, line in enumerate(lines):
+            if line.startswith("+++ "):
+                target = line[4:]
+                filename = target[2:] if target.startswith("b/") else None
+            elif line.startswith("--- ") and filename is None:
+                source = line[4:]
+                filename = source[2:] if source.startswith("a/") else None
+            elif line.startswith("@@"):
+                hunk_start = i
+                break
+        if filename is None or hunk_start is None:
+            continue  # fichier binaire ou simple changement de mode : pas de patch côté API non plus
+        files.append({"filename": filename, "patch": "\n".join(lines[hunk_start:]).rstrip("\n")})
+    return files
+
+
+def get_commit_files_git(repo_path, sha):
+    pathspecs = [f"*{ext}" for ext in IAC_EXTENSIONS]
+    output = run_git(
+        ["show", "--format=", "--patch", "-m", "--first-parent", "--no-color", sha, "--"] + pathspecs,
+        cwd=repo_path,
+    )
+    if output.startswith("diff --git "):
+        output = "\n" + output
+    return {"files": split_patch_by_file(output)}
+
+
+def mine_repository_git(full_name, done_shas=(), since=None):
+    """
+    Travail d'un processus du pool : clone partiel, recherche des commits et
+    patches. Renvoie [(commit, commit_data)] ou lève une erreur git.
+    """
+    repo_path = ensure_partial_clone(full_name)
+    return [
+        (commit, get_commit_files_git(repo_path, commit["sha"]))
+        for commit in search_security_commits_git(repo_path, since=since)
+        if commit["sha"] not in done_shas
+    ]
+
+
+def mine_git(keywords=KEYWORDS, max_pages=20, state=None, workers=GIT_WORKERS, marks=None):
+    """
+    Mode de minage local : seule la recherche de dépôts passe par l'API, les
+    commits et patches viennent de `git log`/`git show` en parallèle par dépôt.
+    """
+    if not GIT_PATH:
+        print("[Erreur] Commande 'git' introuvable : le mode git est indisponible.")
+        return []
+
+    dataset = []
+    seen_diffs = set() if state is None else state["index"]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for keyword in keywords:
+            started_at = watermarks.utc_timestamp()
+            pushed_since = None if marks is None else watermarks.search_since(marks, keyword)
+            repositories = search_valid_repositories(keyword, max_pages=max_pages, state=state,
+                                                     pushed_since=pushed_since)
+            repositories = prioritize_repositories(pending_repositories(keyword, repositories, state, marks))
+
+            # Filigrane de recherche avance seulement si tous les depots ont ete termines
+            complete = True
+            futures = []
+            for repo in repositories:
+                done_shas = set()
+                if state is not None:
+                    done_shas = run_state.done_commits(state, repo["full_name"])
+                futures.append(pool.submit(mine_repository_git, repo["full_name"], done_shas, repo.get("commits_since")))
+
+            # Résultats consommés dans l'ordre des dépôts : mêmes lignes que le mode API
+            for repo, future in zip(repositories, futures):
+                full_name = repo["full_name"]
+                tool = repo.get("tool_used", "Unknown")
+                try:
+                    mined = future.result()
+                except Exception as e:
+                    print(f"\n[Erreur] git sur {full_name} : {e}")
+                    complete = False
+                    continue
+                print(f"\n[Repository] {full_name} | Tool: {tool} | {len(mined)} commits (git)")
+                for commit, commit_data in mined:
+                    if state is not None and run_state.commit_done(state, full_name, commit["sha"]):
+                        continue
+                    rows = build_dataset_rows(full_name, tool, commit, commit_data, seen_diffs)
+                    if state is None:
+                        dataset.extend(rows)
+                    else:
+                        run_state.append_commit_rows(state, full_name, commit["sha"], rows, seen_diffs)
+                finish_repository(keyword, repo, [commit for commit, _ in mined], state, marks)
+            if marks is not None and complete:
+                watermarks.mark_search(marks, keyword, started_at)
+    return dataset
@@ -0,0 +1,304 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# ======== CONFIGURATION ========
+# Taille du pool de connexions keep-alive partagé par tous les appels
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 32
+TIMEOUT = (10, 60)
+# Quotas GitHub par classe d'endpoint : (requetes, periode en secondes)
+RATE_LIMITS = {
+    "search": (30, 60),
+    "core": (5000, 3600),
+}
+# Pool de jetons GitHub : variable d'environnement GITHUB_TOKENS (séparés par des
+# virgules) et/ou fichier TOKENS_FILE (un jeton par ligne), plus ceux passés à add_tokens
+TOKENS_ENV = "GITHUB_TOKENS"
+TOKENS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "github_tokens.txt")
+PLACEHOLDER_TOKENS = {"", "xxx", "YOUR_GITHUB_TOKEN"}
+# Cache HTTP sur disque partagé par extract.py et les scripts de 2-Snyk_tests
+CACHE_ENABLED = True
+CACHE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "github_cache.sqlite")
+# Durée (secondes) pendant laquelle un 404 sur une URL immuable est resservi : il peut venir
+# d'un jeton sans accès au dépôt ou d'un commit pas encore visible, il n'est pas définitif
+NOT_FOUND_TTL = 600
+# ===============================
+
+# Session unique : les connexions TCP/TLS sont réutilisées d'un appel à l'autre
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+
+def endpoint_class(url):
+    """
+    Classe d'endpoint GitHub d'une URL : "search" pour l'API de recherche,
+    "core" pour le reste de l'API REST (quotas distincts côté GitHub).
+    """
+    path = urlparse(url).path
+    return "search" if path.startswith("/search/") else "core"
+
+
+# === ORDONNANCEUR DE QUOTA (token bucket) ===
+# Un seau par (jeton, classe d'endpoint), recalé sur les en-têtes X-RateLimit-* renvoyés
+# par GitHub. Chaque requête part avec le jeton qui a le plus de budget restant.
+_bucket_lock = threading.Lock()
+_tokens = []
+_buckets = {}
+
+
+def _new_bucket(kind):
+    limit, period = RATE_LIMITS[kind]
+    return {
+        "capacity": limit,
+        "tokens": float(limit),
+        "rate": limit / period,
+        "updated": time.monotonic(),
+        "blocked_until": 0.0,
+    }
+
+
+def add_tokens(tokens):
+    """Ajoute des jetons au pool partagé (les valeurs d'exemple et doublons sont ignorés)."""
+    with _bucket_lock:
+        for token in tokens:
+            token = (token or "").strip()
+            if token in PLACEHOLDER_TOKENS or token in _tokens:
+                continue
+            _tokens.append(token)
+            for kind in RATE_LIMITS:
+                _buckets[(token, kind)] = _new_bucket(kind)
+
+
+def pool_size():
+    with _bucket_lock:
+        return len(_tokens)
+
+
+def load_tokens():
+    tokens = os.environ.get(TOKENS_ENV, "").split(",")
+    if os.path.exists(TOKENS_FILE):
+        with open(TOKENS_FILE, encoding="utf-8") as f:
+            tokens += [line for line in f.read().splitlines() if not line.startswith("#")]
+    add_tokens(tokens)
+
+
+def _refill(bucket, now):
+    elapsed = now - bucket["updated"]
+    bucket["tokens"] = min(bucket["capacity"], bucket["tokens"] + elapsed * bucket["rate"])
+    bucket["updated"] = now
+
+
+def acquire_token(kind):
+    """
+    Bloque jusqu'à ce qu'une requête de la classe `kind` puisse partir sans dépasser le quota
+    et renvoie le jeton à utiliser (None si le pool est vide : en-têtes de l'appelant).
+    """
+    while True:
+        with _bucket_lock:
+            now = time.monotonic()
+            best = None
+            wait = float("inf")
+            for token in _tokens or [None]:
+                bucket = _buckets.setdefault((token, kind), _new_bucket(kind))
+                _refill(bucket, now)
+                blocked = bucket["blocked_until"] - now
+                if blocked > 0:
+                    wait = min(wait, blocked)
+                elif bucket["tokens"] >= 1:
+                    if best is None or bucket["tokens"] > best[1]["tokens"]:
+                        best = (token, bucket)
+                else:
+                    wait = min(wait, (1 - bucket["tokens"]) / bucket["rate"])
+            if best is not None:
+                best[1]["tokens"] -= 1
+                return best[0]
+        time.sleep(wait)
+
+
+def drop_token(token):
+    """Retire du pool un jeton refusé par GitHub (401)."""
+    with _bucket_lock:
+        if token in _tokens:
+            _tokens.remove(token)
+            print(f"[Quota] Jeton ...{token[-4:]} invalide, retiré du pool ({len(_tokens)} restants)")
+
+
+def update_rate_limit(kind, response, token=None):
+    """
+    Recale le seau (`token`, `kind`) sur les en-têtes de la réponse : X-RateLimit-Limit/Remaining/Reset
+    et Retry-After. Renvoie le nombre de secondes à attendre avant de rejouer la requête
+    si elle a été refusée pour cause de quota, sinon 0.
+    """
+    headers = response.headers
+    now = time.monotonic()
+    retry_wait = 0.0
+
+    with _bucket_lock:
+        bucket = _buckets.setdefault((token, kind), _new_bucket(kind))
+        _refill(bucket, now)
+
+        limit = headers.get("X-RateLimit-Limit")
+        if limit is not None and limit.isdigit():
+            bucket["capacity"] = int(limit)
+            bucket["rate"] = int(limit) / RATE_LIMITS[kind][1]
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is not None and remaining.isdigit():
+            # Le serveur fait foi : on ne consomme jamais plus que ce qu'il reste réellement
+            bucket["tokens"] = min(bucket["tokens"], float(remaining))
+            if int(remaining) == 0 and reset is not None and reset.isdigit():
+                reset_wait = max(0.0, int(reset) - time.time()) + 1
+                bucket["blocked_until"] = max(bucket["blocked_until"], now + reset_wait)
+                if response.status_code in (403, 429):
+                    retry_wait = reset_wait
+
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            bucket["blocked_until"] = max(bucket["blocked_until"], now + int(retry_after))
+            retry_wait = max(retry_wait, float(retry_after))
+
+    return retry_wait
+
+
+def quota_status():
+    """Budget restant estimé par jeton (4 derniers caractères) et classe d'endpoint."""
+    with _bucket_lock:
+        now = time.monotonic()
+        status = {}
+        for (token, kind), bucket in _buckets.items():
+            _refill(bucket, now)
+            status[(token[-4:] if token else None, kind)] = int(bucket["tokens"])
+        return status
+
+
+load_tokens()
+
+
+# === CACHE HTTP (SQLite) ===
+# Les objets adressés par SHA (commit, contenu à un ref, blob, tree) ne changent jamais :
+# ils sont servis depuis le cache sans requête. Le reste (pages de recherche...) est
+# revalidé avec If-None-Match ; une réponse 304 ressert le corps stocké. Un 404 sur une
+# URL immuable n'est resservi que pendant NOT_FOUND_TTL.
+_IMMUTABLE_PATHS = [
+    re.compile(r"^/repos/[^/]+/[^/]+/commits/[0-9a-f]{40}$"),
+    re.compile(r"^/repos/[^/]+/[^/]+/git/(blobs|trees)/[0-9a-f]{40}$"),
+]
+_CONTENTS_PATH = re.compile(r"^/repos/[^/]+/[^/]+/contents/")
+_SHA_RE = re.compile(r"^[0-9a-f]{40}$")
+
+_cache_lock = threading.Lock()
+_cache_conn = None
+
+
+def is_immutable_url(url):
+    parsed = urlparse(url)
+    if any(p.match(parsed.path) for p in _IMMUTABLE_PATHS):
+        return True
+    if _CONTENTS_PATH.match(parsed.path):
+        ref = parse_qs(parsed.query).get("ref", [""])[0]
+        return bool(_SHA_RE.match(ref))
+    return False
+
+
+def _cache_connection():
+    global _cache_conn
+    if _cache_conn is None:
+        _cache_conn = sqlite3.connect(CACHE_DB, check_same_thread=False)
+        _cache_conn.execute("PRAGMA journal_mode=WAL")
+        _cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            " url TEXT PRIMARY KEY, status INTEGER, etag TEXT, headers TEXT,"
+            " body BLOB, immutable INTEGER, fetched_at REAL)"
+        )
+    return _cache_conn
+
+
+def cache_lookup(url):
+    with _cache_lock:
+        row = _cache_connection().execute(
+            "SELECT status, etag, headers, body, immutable, fetched_at FROM http_cache WHERE url = ?", (url,)
+        ).fetchone()
+    if row is None:
+        return None
+    status, etag, headers, body, immutable, fetched_at = row
+    if status != 200 and time.time() - fetched_at > NOT_FOUND_TTL:
+        return None
+    return {"status": status, "etag": etag, "headers": json.loads(headers), "body": body, "immutable": bool(immutable)}
+
+
+def cache_store(url, response):
+    immutable = is_immutable_url(url)
+    etag = response.headers.get("ETag")
+    cacheable = (response.status_code == 200 and (immutable or etag)) or (response.status_code == 404 and immutable)
+    if not cacheable:
+        return
+    headers = {k: v for k, v in response.headers.items() if k.lower() in ("content-type", "etag", "link")}
+    with _cache_lock:
+        conn = _cache_connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO http_cache (url, status, etag, headers, body, immutable, fetched_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, response.status_code, etag, json.dumps(headers), response.content, int(immutable), time.time()),
+        )
+        conn.commit()
+
+
+def _cached_response(url, cached):
+    response = requests.Response()
+    response.url = url
+    response.status_code = cached["status"]
+    response.headers = CaseInsensitiveDict(cached["headers"])
+    response._content = cached["body"]
+    response.encoding = "utf-8"
+    response.from_cache = True
+    return response
+
+
+def safe_get(url, headers, retries=3, delay=5):
+    cached = cache_lookup(url) if CACHE_ENABLED else None
+    if cached is not None and cached["immutable"]:
+        return _cached_response(url, cached)
+    if cached is not None and cached["etag"]:
+        headers = {**headers, "If-None-Match": cached["etag"]}
+
+    kind = endpoint_class(url)
+    for attempt in range(1, retries + 1):
+        token = acquire_token(kind)
+        request_headers = headers if token is None else {**headers, "Authorization": f"token {token}"}
+        try:
+            response = SESSION.get(url, headers=request_headers, timeout=TIMEOUT)
+        except requests.exceptions.ReadTimeout as e:
+            print(f"[Timeout] Lecture en attente (tentative {attempt}/{retries}) -> {url}")
+        except requests.exceptions.ConnectionError as e:
+            print(f"[Erreur] Connexion echouee ({attempt}/{retries}) : {e}")
+        else:
+            if response.status_code == 401 and token is not None:
+                # Jeton révoqué ou expiré : on rejoue avec un autre jeton du pool
+                drop_token(token)
+                if _tokens:
+                    continue
+            retry_wait = update_rate_limit(kind, response, token)
+            if not retry_wait or attempt == retries:
+                if response.status_code == 304 and cached is not None:
+                    return _cached_response(url, cached)
+                if CACHE_ENABLED:
+                    cache_store(url, response)
+                return response
+            # Quota épuisé : le seau est bloqué jusqu'au reset, acquire_token attendra
+            print(f"[Quota] Limite {kind} atteinte ({attempt}/{retries}), reprise dans {retry_wait:.0f}s -> {url}")
+            continue
+        time.sleep(delay)
+    print(f"[Erreur] Echec definitif apres {retries} tentatives : {url}")
+    return None
@@ -0,0 +1,259 @@
+import queue
+import sqlite3
+import threading
+import time
+
+import run_state
+import watermarks
+from extract import (
+    KEYWORDS,
+    search_valid_repositories, prioritize_repositories, pending_repositories, finish_repository,
+    search_security_commits, get_commit_files, build_dataset_rows,
+)
+
+# ======== CONFIGURATION ========
+# Étapes reliées par des files bornées : une étape lente fait patienter l'amont
+# (contre-pression) au lieu d'accumuler les résultats en mémoire
+COMMIT_SEARCH_WORKERS = 4
+FILE_FETCH_WORKERS = 16
+REPO_QUEUE_SIZE = 32
+COMMIT_QUEUE_SIZE = 128
+RESULT_QUEUE_SIZE = 128
+# Période d'affichage du débit et de la profondeur des files (secondes)
+METRICS_INTERVAL = 30
+# ===============================
+
+_DONE = object()
+
+
+class Stage:
+    """Étape du pipeline : file d'entrée bornée, nombre de workers et compteurs."""
+
+    def __init__(self, name, workers, maxsize):
+        self.name = name
+        self.workers = workers
+        self.queue = queue.Queue(maxsize)
+        self.maxsize = maxsize
+        self.processed = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        self.queue.put(item)  # bloque tant que la file est pleine
+        if item is _DONE:
+            return
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+
+    def record(self, elapsed):
+        with self._lock:
+            self.processed += 1
+            self.busy += elapsed
+
+    def report(self, elapsed):
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        occupancy = self.busy / (elapsed * self.workers) if elapsed > 0 else 0.0
+        line = f"{self.name}: {self.processed} ({rate:.1f}/s, occupation {occupancy:.0%})"
+        if self.maxsize:
+            line += f", file {self.queue.qsize()}/{self.maxsize} (max {self.max_depth})"
+        return line
+
+
+def _start_workers(stage, handle, on_exit):
+    """Lance les workers de `stage` ; `on_exit` est appelé une fois le dernier worker terminé."""
+    remaining = [stage.workers]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                handle(item)
+            except Exception as e:
+                print(f"\n[Erreur] Étape {stage.name} : {e}")
+            stage.record(time.perf_counter() - start)
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            on_exit()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def _database_path(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def _connect(path, timeout):
+    """
+    Connexion d'un thread d'étape sur une base déjà ouverte par le thread appelant.
+    Le thread de recherche journalise ses pages pendant que l'écrivain valide
+    ses commits : WAL et une attente généreuse évitent « database is locked ».
+    """
+    conn = sqlite3.connect(path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def mine_pipeline(keywords=KEYWORDS, max_pages=20, state=None, marks=None,
+                  commit_workers=COMMIT_SEARCH_WORKERS, file_workers=FILE_FETCH_WORKERS):
+    """
+    Moteur en pipeline : recherche de dépôts -> recherche de commits ->
+    récupération des fichiers -> écriture, chaque étape dans ses propres
+    threads. Les lignes sont écrites dans l'ordre d'arrivée des commits.
+    """
+    search = Stage("recherche", 1, 0)  # source : pas de file d'entrée
+    commits = Stage("commits", commit_workers, REPO_QUEUE_SIZE)
+    files = Stage("fichiers", file_workers, COMMIT_QUEUE_SIZE)
+    writer = Stage("ecriture", 1, RESULT_QUEUE_SIZE)
+    stages = (search, commits, files, writer)
+    searched_keywords = {}
+    errors = []
+
+    # Le thread de recherche ouvre ses propres connexions sur les mêmes bases :
+    # les objets sqlite3 ne se partagent pas entre threads (WAL : lectures concurrentes)
+    state_path = None if state is None else _database_path(state["conn"])
+    marks_path = None if marks is None else _database_path(marks)
+
+    def search_stage():
+        view = view_marks = None
+        try:
+            if state_path is not None:
+                view = {**state, "conn": _connect(state_path, run_state.BUSY_TIMEOUT)}
+            if marks_path is not None:
+                view_marks = _connect(marks_path, watermarks.BUSY_TIMEOUT)
+            for keyword in keywords:
+                start = time.perf_counter()
+                started_at = watermarks.utc_timestamp()
+                pushed_since = None if view_marks is None else watermarks.search_since(view_marks, keyword)
+                repositories = search_valid_repositories(keyword, max_pages=max_pages, state=view,
+                                                         pushed_since=pushed_since)
+                repositories = prioritize_repositories(pending_repositories(keyword, repositories, view, view_marks))
+                search.busy += time.perf_counter() - start
+                for repo in repositories:
+                    done_shas = set() if view is None else run_state.done_commits(view, repo["full_name"])
+                    commits.put((keyword, repo, done_shas))
+                    search.processed += 1
+                searched_keywords[keyword] = started_at
+        except Exception as e:
+            errors.append(e)
+            print(f"\n[Erreur] Étape recherche : {e}")
+        finally:
+            for _ in range(commits.workers):
+                commits.put(_DONE)
+            for conn in (view and view["conn"], view_marks):
+                if conn is not None:
+                    conn.close()
+
+    def commit_stage(item):
+        keyword, repo, done_shas = item
+        try:
+            found = search_security_commits(repo["full_name"], since=repo.get("commits_since"))
+        except Exception as e:
+            print(f"\n[Erreur] Étape commits : {repo['full_name']} : {e}")
+            found = None
+        if found is None:
+            writer.put(("repo", keyword, repo, None, 0))
+            return
+        pending = [commit for commit in found if commit["sha"] not in done_shas]
+        # Annoncé à l'écrivain avant les fichiers : il sait quand le dépôt est complet
+        writer.put(("repo", keyword, repo, found, len(pending)))
+        for commit in pending:
+            files.put((keyword, repo, commit))
+
+    def file_stage(item):
+        keyword, repo, commit = item
+        # Toujours un message par commit annoncé, None en cas d'échec : l'écrivain tient le compte du dépôt
+        try:
+            commit_data = get_commit_files(repo["full_name"], commit["sha"])
+        except Exception as e:
+            print(f"\n[Erreur] Étape fichiers : {repo['full_name']}@{commit['sha']} : {e}")
+            commit_data = None
+        writer.put(("commit", keyword, repo, commit, commit_data))
+
+    def close_files():
+        for _ in range(files.workers):
+            files.put(_DONE)
+
+    def close_writer():
+        writer.put(_DONE)
+
+    stop_metrics = threading.Event()
+    started = time.perf_counter()
+
+    def metrics():
+        while not stop_metrics.wait(METRICS_INTERVAL):
+            elapsed = time.perf_counter() - started
+            print("\n[Pipeline] " + " | ".join(stage.report(elapsed) for stage in stages))
+
+    threading.Thread(target=metrics, daemon=True).start()
+    threading.Thread(target=search_stage, daemon=True).start()
+    _start_workers(commits, commit_stage, close_files)
+    _start_workers(files, file_stage, close_writer)
+
+    # Écriture dans le thread appelant : seul propriétaire du journal du run et de l'index des hunks
+    dataset = []
+    seen_diffs = set() if state is None else state["index"]
+    open_repos = {}
+    incomplete = set()
+    while True:
+        message = writer.queue.get()
+        if message is _DONE:
+            break
+        start = time.perf_counter()
+        if message[0] == "repo":
+            _, keyword, repo, found, pending = message
+            if found is None:
+                # Recherche incomplete : le depot reste ouvert, ni termine ni filigrane avance
+                incomplete.add(keyword)
+                writer.record(time.perf_counter() - start)
+                continue
+            print(f"\n[Repository] {repo['full_name']} | Tool: {repo.get('tool_used', 'Unknown')} "
+                  f"| {pending} commits a recuperer")
+            if pending == 0:
+                finish_repository(keyword, repo, found, state, marks)
+            else:
+                open_repos[(keyword, repo["full_name"])] = [found, pending, False]
+        else:
+            _, keyword, repo, commit, commit_data = message
+            full_name = repo["full_name"]
+            entry = open_repos[(keyword, full_name)]
+            if commit_data is None:
+                print(f"[Erreur] Fichiers indisponibles pour {full_name}@{commit['sha']}")
+                entry[2] = True
+            else:
+                rows = build_dataset_rows(full_name, repo.get("tool_used", "Unknown"), commit, commit_data, seen_diffs)
+                if state is None:
+                    dataset.extend(rows)
+                else:
+                    run_state.append_commit_rows(state, full_name, commit["sha"], rows, seen_diffs)
+            entry[1] -= 1
+            if entry[1] == 0:
+                # Un commit en echec garde le depot ouvert : il sera retente au prochain run
+                if entry[2]:
+                    incomplete.add(keyword)
+                else:
+                    finish_repository(keyword, repo, entry[0], state, marks)
+                del open_repos[(keyword, full_name)]
+        writer.record(time.perf_counter() - start)
+
+    stop_metrics.set()
+    elapsed = time.perf_counter() - started
+    print(f"\n[Pipeline] Terminé en {elapsed:.1f}s")
+    for stage in stages:
+        print(f"  {stage.report(elapsed)}")
+
+    if marks is not None and not errors:
+        for keyword, started_at in searched_keywords.items():
+            if keyword not in incomplete:
+                watermarks.mark_search(marks, keyword, started_at)
+    return dataset
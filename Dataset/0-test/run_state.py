@@ -0,0 +1,131 @@
+import json
+import os
+import sqlite3
+
+from dedup_index import HunkIndex
+
+# ======== CONFIGURATION ========
+# Dossier d'un run de minage : journal SQLite + lignes du dataset en JSONL (append-only)
+RUN_DIR = "mining_run"
+# Attente maximale (secondes) d'un écrivain quand un autre thread tient le verrou d'écriture
+BUSY_TIMEOUT = 60
+# ===============================
+
+
+def open_run(run_dir=RUN_DIR, index_path=None):
+    """
+    Ouvre (ou reprend) un run. Le fichier JSONL est tronqué au dernier offset
+    journalisé : les lignes d'un commit interrompu avant son enregistrement
+    dans le journal sont réécrites à la reprise, jamais dupliquées.
+    L'index des hunks (dedup_index) est partagé entre les runs.
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(run_dir, "state.sqlite"), timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS pages (keyword TEXT, query TEXT, page INTEGER,
+                                          PRIMARY KEY (keyword, query, page));
+        CREATE TABLE IF NOT EXISTS repos (keyword TEXT, full_name TEXT, data TEXT, done INTEGER DEFAULT 0,
+                                          PRIMARY KEY (keyword, full_name));
+        CREATE TABLE IF NOT EXISTS commits (repo TEXT, sha TEXT, PRIMARY KEY (repo, sha));
+        CREATE TABLE IF NOT EXISTS diffs (diff_key BLOB PRIMARY KEY);
+    """)
+    conn.commit()
+
+    rows_path = os.path.join(run_dir, "rows.jsonl")
+    row = conn.execute("SELECT value FROM meta WHERE key = 'rows_offset'").fetchone()
+    offset = int(row[0]) if row else 0
+    if os.path.exists(rows_path) and os.path.getsize(rows_path) > offset:
+        with open(rows_path, "r+b") as f:
+            f.truncate(offset)
+        print(f"[Reprise] {rows_path} tronqué à l'offset journalisé {offset}")
+
+    # La table `diffs` du run fait foi : on rejoue dans l'index les clés d'un
+    # commit journalisé dont l'écriture dans l'index a été interrompue
+    index = HunkIndex(index_path) if index_path else HunkIndex()
+    index.add_many(key for (key,) in conn.execute("SELECT diff_key FROM diffs"))
+
+    sink = open(rows_path, "ab")
+    return {"conn": conn, "sink": sink, "rows_path": rows_path, "index": index}
+
+
+def close_run(state):
+    state["sink"].close()
+    state["conn"].close()
+    state["index"].close()
+
+
+def page_done(state, keyword, query, page):
+    return state["conn"].execute(
+        "SELECT 1 FROM pages WHERE keyword = ? AND query = ? AND page = ?", (keyword, query, page)
+    ).fetchone() is not None
+
+
+def mark_page_done(state, keyword, query, page, repos):
+    """Journalise une page de recherche et les dépôts retenus sur cette page."""
+    conn = state["conn"]
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO repos (keyword, full_name, data) VALUES (?, ?, ?)",
+            [(keyword, repo["full_name"].lower(), json.dumps(repo)) for repo in repos],
+        )
+        conn.execute("INSERT OR IGNORE INTO pages VALUES (?, ?, ?)", (keyword, query, page))
+
+
+def load_repositories(state, keyword):
+    """Dépôts journalisés pour un mot-clé, dans l'ordre où ils ont été trouvés."""
+    return [
+        json.loads(data)
+        for (data,) in state["conn"].execute("SELECT data FROM repos WHERE keyword = ? ORDER BY rowid", (keyword,))
+    ]
+
+
+def repo_done(state, keyword, full_name):
+    return state["conn"].execute(
+        "SELECT 1 FROM repos WHERE keyword = ? AND full_name = ? AND done = 1", (keyword, full_name.lower())
+    ).fetchone() is not None
+
+
+def mark_repo_done(state, keyword, full_name):
+    conn = state["conn"]
+    with conn:
+        conn.execute("UPDATE repos SET done = 1 WHERE keyword = ? AND full_name = ?", (keyword, full_name.lower()))
+
+
+def commit_done(state, full_name, sha):
+    return state["conn"].execute(
+        "SELECT 1 FROM commits WHERE repo = ? AND sha = ?", (full_name.lower(), sha)
+    ).fetchone() is not None
+
+
+def done_commits(state, full_name):
+    return {
+        sha for (sha,) in state["conn"].execute("SELECT sha FROM commits WHERE repo = ?", (full_name.lower(),))
+    }
+
+
+def append_commit_rows(state, full_name, sha, rows, seen_diffs):
+    """
+    Ajoute les lignes d'un commit au JSONL puis, dans une seule transaction,
+    marque le commit traité, enregistre ses diffs et le nouvel offset du JSONL.
+    Les clés sont ensuite reportées dans l'index persistant.
+    """
+    sink = state["sink"]
+    for row in rows:
+        sink.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+    sink.flush()
+    os.fsync(sink.fileno())
+
+    conn = state["conn"]
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO diffs VALUES (?)", [(key,) for key in seen_diffs.pending])
+        conn.execute("INSERT OR IGNORE INTO commits VALUES (?, ?)", (full_name.lower(), sha))
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('rows_offset', ?)", (str(sink.tell()),))
+    seen_diffs.commit()
+
+
+def iter_rows(state):
+    with open(state["rows_path"], "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
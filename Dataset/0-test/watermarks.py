@@ -0,0 +1,58 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+# ======== CONFIGURATION ========
+# Filigranes du mode incrémental, conservés d'un run à l'autre
+WATERMARK_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "watermarks.sqlite")
+# Attente maximale (secondes) d'un écrivain quand un autre thread tient le verrou d'écriture
+BUSY_TIMEOUT = 60
+# ===============================
+
+
+def open_watermarks(path=WATERMARK_DB):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS searches (keyword TEXT PRIMARY KEY, searched_at TEXT);
+        CREATE TABLE IF NOT EXISTS repos (full_name TEXT PRIMARY KEY, pushed_at TEXT, last_commit_date TEXT);
+    """)
+    conn.commit()
+    return conn
+
+
+def utc_timestamp(value=None):
+    """Horodatage ISO 8601 en UTC, au format des qualificatifs de date de la recherche GitHub."""
+    moment = datetime.now(timezone.utc) if value is None else datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def search_since(conn, keyword):
+    """Début de la dernière recherche complète du mot-clé (None : jamais cherché)."""
+    row = conn.execute("SELECT searched_at FROM searches WHERE keyword = ?", (keyword,)).fetchone()
+    return row[0] if row else None
+
+
+def mark_search(conn, keyword, started_at):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO searches VALUES (?, ?)", (keyword, started_at))
+
+
+def repo_watermark(conn, full_name):
+    """(pushed_at, date du dernier commit miné) du dépôt, ou None s'il n'a jamais été miné."""
+    return conn.execute(
+        "SELECT pushed_at, last_commit_date FROM repos WHERE full_name = ?", (full_name.lower(),)
+    ).fetchone()
+
+
+def mark_repo(conn, full_name, pushed_at, commit_dates):
+    """Enregistre le pushed_at vu à la recherche et avance la date du dernier commit miné."""
+    previous = repo_watermark(conn, full_name)
+    dates = [utc_timestamp(d) for d in commit_dates if d]
+    if previous and previous[1]:
+        dates.append(previous[1])
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO repos VALUES (?, ?, ?)",
+            (full_name.lower(), pushed_at, max(dates) if dates else None),
+        )
@@ -0,0 +1,308 @@
+import ast
+import hashlib
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from normaliseurs import forme_canonique, langage_fichier
+from schema_dataset import (
+    ANNEES, TAILLE_LOT,
+    masque_annees, decompacte, concatene, charge_par_lots, ClasseurEnFlux,
+)
+
+# === Paramètres ===
+DOSSIER_RAPPORTS = r"C:\Users\DELL\Documents\DIC3 Docs\Lux\sujet\reports\evolution_fichiers_excels"
+DOSSIER_SORTIE = r"C:\Users\DELL\Documents\DIC3 Docs\Lux\sujet\reports\2022-2024"
+
+PATTERNS = {
+    "Outdated Software Version": [
+        'version', '2018', '2019', '"1.', '"2.', 'deprecated', 'old_version', 'legacy'
+    ],
+    "Insecure Configuration Management": [
+        'ssl_verify = false', 'skip_ssl_validation', 'insecure = true', 'validate_tls = false',
+        'allow_insecure', 'disable_ssl', 'skip_tls_verify', 'allow_unverified_ssl',
+        'verify_ssl: false', 'validate_certs: false'
+    ],
+    "Outdated Dependencies": [
+        'require', 'dependency', 'version <', 'lockfile missing', 'dependency outdated',
+        'update dependency', 'old package'
+    ],
+    "Path Traversal": [
+        '../', '..\\', '../../../', 'directory traversal', 'file path manipulation'
+    ],
+    "Sensitive Information Exposure": [
+        'password', 'secret', 'api_key', 'access_token', 'private_key', 'credentials',
+        'secret_key', 'hardcoded credentials'
+    ],
+    "Code Injection": [
+        'eval', 'templatefile', 'inline_template', 'dynamic code', 'code injection',
+        'untrusted input', 'unsafe eval'
+    ],
+    "Command Injection": [
+        'shell', 'exec', 'command', 'local-exec', 'system(', 'popen', 'os.system', 'subprocess'
+    ],
+    "Insecure Input Handling": [
+        'input(', 'deserialize', 'yaml.load', 'unsafe deserialization', 'no input validation',
+        'input validation missing'
+    ],
+    "Insecure Dependency Management": [
+        'dependency', 'package', 'source =', 'git::', 'pinned version missing',
+        'requirement not specified', 'dependency confusion', 'dependency hijacking'
+    ],
+    "Inadequate Naming Convention": [
+        'badname', 'uglyname', 'invalid_name', 'wrong_case', 'not_snake_case', 'improper naming'
+    ]
+}
+
+# Jeu réduit utilisé par l'ancien script Vagrant
+PATTERNS_VAGRANT = {
+    "Outdated Software Version": ['version', '2018', '2019', '"1.', '"2.', 'deprecated', 'old_version', 'legacy'],
+    "Insecure Configuration Management": PATTERNS["Insecure Configuration Management"],
+    "Outdated Dependencies": ['require', 'dependency', 'version <', 'lockfile missing', 'dependency outdated'],
+    "Path Traversal": PATTERNS["Path Traversal"],
+    "Sensitive Information Exposure": [
+        'password', 'secret', 'api_key', 'access_token', 'private_key', 'credentials', 'secret_key'
+    ],
+    "Code Injection": ['eval', 'templatefile', 'inline_template', 'code injection', 'dynamic code'],
+    "Command Injection": ['shell', 'exec', 'command', 'system(', 'popen', 'os.system', 'subprocess'],
+    "Insecure Input Handling": ['input(', 'deserialize', 'yaml.load', 'no input validation'],
+    "Insecure Dependency Management": ['dependency', 'source =', 'git::', 'dependency hijacking'],
+    "Inadequate Naming Convention": ['badname', 'uglyname', 'invalid_name', 'wrong_case']
+}
+
+PULUMI_FICHIERS = ['Pulumi.yaml', 'Pulumi.dev.yaml', 'Pulumi.prod.yaml']
+PULUMI_EXTENSIONS = ('.ts', '.js', '.py', '.go')
+TERRAFORM_SUFFIXES = ('.tf', '.tfvars', 'main.tf', 'variables.tf', 'backend.tf', 'outputs.tf')
+# Empreintes de code gardées en mémoire (les moins récemment utilisées sont oubliées)
+TAILLE_CACHE_EMPREINTES = 200000
+
+
+def detecte_vulnerabilite_generic(text_snippet, smell_category, patterns=PATTERNS):
+    """Version ligne à ligne, conservée pour les appels ponctuels."""
+    text = str(text_snippet).lower()
+    return any(p in text for p in patterns.get(smell_category, []))
+
+
+def detecte_vulnerabilites(df, patterns=PATTERNS):
+    """
+    Équivalent vectorisé de detecte_vulnerabilite_generic sur tout le DataFrame.
+    Par smell_category, un str.contains littéral par motif, appliqué seulement aux
+    lignes pas encore validées : les textes sont longs (~25 ko), la recherche de
+    sous-chaîne y est bien plus rapide qu'une alternative regex.
+    """
+    texte = (df['previous_code'].fillna('') + " " + df['after_code'].fillna('') + " "
+             + df['commit_message'].fillna('')).str.lower()
+    valide = pd.Series(False, index=df.index)
+    for categorie, index in df.groupby('smell_category', sort=False, observed=True).groups.items():
+        restant = texte.loc[index]
+        for motif in patterns.get(categorie, []):
+            if restant.empty:
+                break
+            trouve = restant.str.contains(motif, regex=False)
+            valide.loc[trouve.index[trouve]] = True
+            restant = restant[~trouve]
+    return valide
+
+
+# Empreintes des cellules de code déjà vues, indexées par hash du (langage, contenu brut) :
+# un contenu revu tant qu'il est dans le cache n'est pas reparsé. Le cache est borné
+# (LRU, TAILLE_CACHE_EMPREINTES) et vidé à chaque rapport : la mémoire ne dépend pas du
+# nombre de cellules lues
+_empreintes = OrderedDict()
+
+
+def _hash(texte):
+    return hashlib.blake2b(texte.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def _structure(texte, langage):
+    """Empreinte de la forme canonique (normaliseur IaC, sinon AST Python), None si le code ne se parse pas."""
+    try:
+        # Texte non strippé : l'indentation de la première ligne compte en YAML
+        canonique = forme_canonique(texte, langage)
+        if canonique is None:
+            canonique = ast.dump(ast.parse(texte.strip()))
+        return _hash(canonique)
+    except Exception:
+        return None
+
+
+def empreinte_code(code, langage=None):
+    """
+    (empreinte structurelle ou None, empreinte du code sans blancs), calculée une fois
+    par contenu distinct. `langage` : voir normaliseurs.langage_fichier.
+    """
+    texte = str(code)
+    cle = _hash(f"{langage}\x00{texte}")
+    empreinte = _empreintes.get(cle)
+    if empreinte is not None:
+        _empreintes.move_to_end(cle)
+        return empreinte
+    empreinte = (_structure(texte, langage), _hash(re.sub(r'\s+', '', texte)))
+    _empreintes[cle] = empreinte
+    if len(_empreintes) > TAILLE_CACHE_EMPREINTES:
+        _empreintes.popitem(last=False)
+    return empreinte
+
+
+def codes_equivalents(code1, code2, langage=None):
+    """Même forme canonique si les deux codes se parsent, sinon même code aux blancs près."""
+    arbre1, brut1 = empreinte_code(code1, langage)
+    arbre2, brut2 = empreinte_code(code2, langage)
+    if arbre1 is not None and arbre2 is not None:
+        return arbre1 == arbre2
+    return brut1 == brut2
+
+
+def empreintes(df):
+    """
+    Colonnes d'empreintes avant/après (forme canonique du langage du fichier et sans blancs) : regrouper des paires
+    équivalentes devient un groupby sur ces colonnes.
+    """
+    colonnes = {}
+    langages = df['filepath'].map(langage_fichier)  # une fois par chemin distinct (catégories)
+    for cote, colonne in (('avant', 'previous_code'), ('apres', 'after_code')):
+        valeurs = [empreinte_code(code, langage) for code, langage in zip(df[colonne], langages)]
+        colonnes[f'ast_{cote}'] = [arbre for arbre, _ in valeurs]
+        colonnes[f'brut_{cote}'] = [brut for _, brut in valeurs]
+    return pd.DataFrame(colonnes, index=df.index)
+
+
+# === Étapes de filtrage (chaque outil en enchaîne une partie, dans l'ordre des anciens scripts) ===
+
+def filtre_annees(df):
+    return df[(df['annees'] & masque_annees(ANNEES)) != 0]
+
+
+def nettoie_echappements(caracteres):
+    """Remplace les séquences échappées (\\/ , \\$) dans le code et le message de commit."""
+    motif = r'\\([' + re.escape(caracteres) + r'])'
+
+    def etape(df):
+        df = df.copy()
+        for col in ['previous_code', 'after_code', 'commit_message']:
+            df[col] = df[col].astype(str).str.replace(motif, r'\1', regex=True)
+        return df
+    return etape
+
+
+def filtre_codes_modifies(df):
+    e = empreintes(df)
+    parses = e['ast_avant'].notna() & e['ast_apres'].notna()
+    equivalents = (parses & (e['ast_avant'] == e['ast_apres'])) | (~parses & (e['brut_avant'] == e['brut_apres']))
+    return df[~equivalents]
+
+
+def filtre_fichiers_pulumi(df):
+    chemins = df['filepath']
+    pulumi = chemins.str.contains("|".join(re.escape(f) for f in PULUMI_FICHIERS), regex=True, na=False)
+    return df[chemins.str.endswith(PULUMI_EXTENSIONS, na=False) | pulumi]
+
+
+def filtre_fichiers_terraform(df):
+    return df[df['filepath'].str.endswith(TERRAFORM_SUFFIXES, na=False)]
+
+
+OUTILS = {
+    "ansible": {"rapport": "Ansible_report.xlsx", "etapes": [filtre_annees]},
+    "chef": {"rapport": "Chef_report.xlsx", "etapes": [filtre_annees, nettoie_echappements("/")]},
+    "pulumi": {"rapport": "Pulumi_report.xlsx",
+               "etapes": [filtre_annees, filtre_codes_modifies, filtre_fichiers_pulumi]},
+    # Le dataset Puppet publié ne retient que le filtre sur les années
+    "puppet": {"rapport": "Puppet_report.xlsx", "etapes": [filtre_annees], "detection": False},
+    "saltstack": {"rapport": "Saltstack_report.xlsx", "etapes": [filtre_annees], "rejets": True},
+    "terraform": {"rapport": "Terraform_report.xlsx", "etapes": [filtre_annees, filtre_fichiers_terraform]},
+    "vagrant": {"rapport": "Vagrant_report.xlsx",
+                "etapes": [filtre_annees, nettoie_echappements("/$"), filtre_codes_modifies],
+                "patterns": PATTERNS_VAGRANT},
+}
+
+
+def filtre_outil(outil, df):
+    """Étapes de l'outil puis détection vectorisée : (lignes restantes, masque des lignes valides)."""
+    config = OUTILS[outil]
+    for etape in config["etapes"]:
+        df = etape(df)
+    if not config.get("detection", True):
+        return df, pd.Series(True, index=df.index)
+    return df, detecte_vulnerabilites(df, config.get("patterns", PATTERNS))
+
+
+def construire_dataset_outil(outil, filepath_excel=None, output_file=None, output_rejetes=None, bilan=None,
+                             conserve=True, taille_lot=TAILLE_LOT):
+    """
+    Construit le dataset 2022-2024 d'un outil et renvoie les lignes valides
+    (valides et rejetées pour les outils configurés avec "rejets").
+    Le rapport est lu et filtré par lots de `taille_lot` lignes et les sorties
+    écrites au fil de l'eau ; avec conserve=False rien n'est gardé en mémoire
+    entre deux lots et la fonction renvoie None.
+    `bilan` : liste à laquelle ajouter (outil, lignes lues, lignes gardées, durée lecture, durée filtrage).
+    """
+    config = OUTILS[outil]
+    filepath_excel = filepath_excel or os.path.join(DOSSIER_RAPPORTS, config["rapport"])
+    output_file = output_file or os.path.join(DOSSIER_SORTIE, f"dataset_{outil}_2022_2024.xlsx")
+    output_rejetes = output_rejetes or os.path.join(DOSSIER_SORTIE, f"rejected_{outil}_2022_2024.xlsx")
+
+    _empreintes.clear()  # les extraits d'un rapport ne se retrouvent pas dans celui d'un autre outil
+    sortie_valides = ClasseurEnFlux(output_file)
+    sortie_rejetes = ClasseurEnFlux(output_rejetes) if config.get("rejets") else None
+    valides, rejetes = [], []
+    lignes, lecture, filtrage = 0, 0.0, 0.0
+
+    lots = charge_par_lots(filepath_excel, taille_lot=taille_lot, annees=ANNEES)
+    while True:
+        debut = time.perf_counter()
+        df = next(lots, None)
+        lecture += time.perf_counter() - debut
+        if df is None:
+            break
+        lignes += len(df)
+
+        debut = time.perf_counter()
+        df, valide = filtre_outil(outil, df)
+        filtrage += time.perf_counter() - debut
+
+        sortie_valides.ajoute(df[valide])
+        if conserve:
+            valides.append(df[valide])
+        if sortie_rejetes is not None:
+            sortie_rejetes.ajoute(df[~valide])
+            if conserve:
+                rejetes.append(df[~valide])
+
+    sortie_valides.ferme()
+    if bilan is not None:
+        # lignes lues : celles des années ciblées, les autres sont écartées à la lecture
+        bilan.append((outil, lignes, sortie_valides.lignes, lecture, filtrage))
+
+    if sortie_rejetes is None:
+        print(f"✅ Fichier exporté : {output_file} ({sortie_valides.lignes} lignes)")
+        return decompacte(concatene(valides)) if conserve else None
+    sortie_rejetes.ferme()
+    print(f"✅ Export terminé : {sortie_valides.lignes} valides, {sortie_rejetes.lignes} rejetées")
+    return (decompacte(concatene(valides)), decompacte(concatene(rejetes))) if conserve else None
+
+
+def construire_datasets(outils=None):
+    """Construit les datasets de plusieurs outils (tous par défaut) et affiche le débit par outil."""
+    bilan = []
+    for outil in outils or OUTILS:
+        rapport = os.path.join(DOSSIER_RAPPORTS, OUTILS[outil]["rapport"])
+        if not os.path.exists(rapport):
+            print(f"⚠️ Rapport introuvable pour {outil} : {rapport}")
+            continue
+        construire_dataset_outil(outil, rapport, bilan=bilan, conserve=False)
+
+    print("\n=== Débit par outil ===")
+    for outil, lignes, gardees, lecture, filtrage in bilan:
+        debit = lignes / filtrage if filtrage > 0 else float('inf')
+        print(f"{outil:<10} {lignes:>9} lignes -> {gardees:>7} gardées | lecture {lecture:.2f}s | "
+              f"filtrage {filtrage:.2f}s ({debit:,.0f} lignes/s)")
+
+
+if __name__ == "__main__":
+    construire_datasets(sys.argv[1:] or None)
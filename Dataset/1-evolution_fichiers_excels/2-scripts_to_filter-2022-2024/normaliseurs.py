@@ -0,0 +1,212 @@
+import json
+import os
+import re
+
+try:
+    import yaml
+    # BaseLoader : chaque scalaire reste la chaîne écrite (1.10 ≠ 1.1, 0644 ≠ 420)
+    YamlLoader = getattr(yaml, 'CBaseLoader', yaml.BaseLoader)
+except ImportError:  # PyYAML absent : les fragments YAML passent par le tokenizer
+    yaml = None
+
+# === Paramètres ===
+# Langage déduit du chemin du fichier modifié (extension, ou nom exact en minuscules)
+LANGAGE_PAR_EXTENSION = {
+    '.tf': 'hcl', '.tfvars': 'hcl', '.hcl': 'hcl',
+    '.yml': 'yaml', '.yaml': 'yaml', '.sls': 'yaml',
+    '.rb': 'ruby', '.rake': 'ruby', '.gemspec': 'ruby',
+    '.pp': 'puppet',
+    '.py': 'python',
+}
+LANGAGE_PAR_NOM = {'vagrantfile': 'ruby', 'gemfile': 'ruby', 'rakefile': 'ruby', 'berksfile': 'ruby'}
+
+# Jetons par langage, dans l'ordre de priorité : (nature, motif). Les chaînes passent
+# avant les commentaires pour qu'un '#' entre guillemets ne coupe pas la ligne
+_LIGNE = ('ligne', r'\n')
+_CHAINE_DOUBLE = ('chaine', r'"(?:[^"\\\n]|\\.)*"?')
+_CHAINE_SIMPLE = ('chaine', r"'(?:[^'\\\n]|\\.)*'?")
+_COMMENTAIRE_BLOC = ('commentaire', r'/\*.*?(?:\*/|\Z)')
+_NOMBRE = ('jeton', r'\d[\w.]*')
+_IDENT = ('jeton', r'[A-Za-z_$@:][\w:.\-?!]*')
+_SYMBOLE = ('jeton', r'=>|->|==|!=|<=|>=|=~|&&|\|\||::|\S')
+# Heredoc HCL (<<EOF, <<-EOF) jusqu'à sa marque de fin : corps gardé tel quel, sans commentaires ni tri
+_HEREDOC = ('litteral', r'<<-?(?P<marque>[A-Za-z_]\w*)[ \t]*\n.*?(?:^[ \t]*(?P=marque)[ \t]*$|\Z)')
+
+SPECIFICATIONS = {
+    'hcl': [_LIGNE, _HEREDOC, _CHAINE_DOUBLE, _COMMENTAIRE_BLOC, ('commentaire', r'(?:#|//)[^\n]*'),
+            _NOMBRE, _IDENT, _SYMBOLE],
+    'yaml': [_LIGNE, _CHAINE_DOUBLE, _CHAINE_SIMPLE, ('commentaire', r'(?:^[ \t]*|(?<=\s))#(?=\s|$)[^\n]*'),
+             _NOMBRE, _IDENT, _SYMBOLE],
+    'ruby': [_LIGNE, ('commentaire', r'^=begin\b.*?(?:^=end\b[^\n]*|\Z)'), _CHAINE_DOUBLE, _CHAINE_SIMPLE,
+             ('commentaire', r'#[^\n]*'), _NOMBRE, _IDENT, _SYMBOLE],
+    'puppet': [_LIGNE, _CHAINE_DOUBLE, _CHAINE_SIMPLE, _COMMENTAIRE_BLOC, ('commentaire', r'#[^\n]*'),
+               _NOMBRE, _IDENT, _SYMBOLE],
+}
+_REGEX = {
+    langage: (re.compile('|'.join(f'({motif})' for _, motif in specification), re.DOTALL | re.MULTILINE),
+              # Une nature par groupe : les groupes internes d'un motif (marque du heredoc) décalent les suivants
+              [n for nature, motif in specification for n in [nature] + [None] * re.compile(motif).groups])
+    for langage, specification in SPECIFICATIONS.items()
+}
+
+OUVRANTS = {'(', '[', '{'}
+FERMANTS = {')', ']', '}'}
+FIN_DE_LIGNE = '\n'
+# Ligne qui ouvre un scalaire bloc YAML (`run: |`, `- >-`) : les lignes plus indentées sont du texte brut
+DEBUT_BLOC_YAML = re.compile(r'(?:^|[:\s])[|>][-+0-9]*\s*(?:#.*)?$')
+# ===============================
+
+
+def langage_fichier(filepath):
+    """Langage IaC du fichier (None si aucun normaliseur ne s'applique)."""
+    if not isinstance(filepath, str):
+        return None
+    nom = os.path.basename(filepath).lower()
+    if nom in LANGAGE_PAR_NOM:
+        return LANGAGE_PAR_NOM[nom]
+    return LANGAGE_PAR_EXTENSION.get(os.path.splitext(nom)[1])
+
+
+def _chaine_canonique(jeton, interpolation):
+    """'abc' et "abc" donnent le même jeton quand aucune interpolation ni échappement n'en dépend."""
+    contenu = jeton[1:-1] if len(jeton) > 1 and jeton[-1] == jeton[0] else jeton[1:]
+    if jeton[0] == '"' and ('\\' in contenu or (interpolation and interpolation in contenu)):
+        return jeton
+    if jeton[0] == "'" and '\\' in contenu:
+        return jeton
+    return 'str:' + contenu
+
+
+def _jetons(code, langage, interpolation):
+    """Flux de jetons sans commentaires ni blancs ; les fins de ligne sont gardées (séparateurs)."""
+    regex, natures = _REGEX[langage]
+    jetons = []
+    for correspondance in regex.finditer(code):
+        jeton = correspondance.group(0)
+        nature = natures[correspondance.lastindex - 1]
+        if nature == 'ligne':
+            if jetons and jetons[-1] != FIN_DE_LIGNE:
+                jetons.append(FIN_DE_LIGNE)
+        elif nature == 'commentaire':
+            continue
+        elif nature == 'chaine':
+            jetons.append(_chaine_canonique(jeton, interpolation))
+        elif nature == 'litteral':
+            jetons.append('lit:' + jeton)
+        else:
+            jetons.append(jeton)
+    return _lignes_compactes(jetons)
+
+
+def _lignes_compactes(jetons):
+    """Retire les fins de ligne en tête, en queue et répétées."""
+    resultat = []
+    for jeton in jetons:
+        if jeton == FIN_DE_LIGNE and (not resultat or resultat[-1] == FIN_DE_LIGNE):
+            continue
+        resultat.append(jeton)
+    if resultat and resultat[-1] == FIN_DE_LIGNE:
+        resultat.pop()
+    return resultat
+
+
+def _sans_virgule_finale(jetons):
+    """[a, b,] et {a => 1,} équivalent à [a, b] et {a => 1}."""
+    resultat = []
+    for jeton in jetons:
+        if jeton in FERMANTS:
+            i = len(resultat) - 1
+            while i >= 0 and resultat[i] == FIN_DE_LIGNE:
+                i -= 1
+            if i >= 0 and resultat[i] == ',':
+                del resultat[i]
+        resultat.append(jeton)
+    return resultat
+
+
+def _trie_attributs(jetons, operateur):
+    """
+    Trie les suites de lignes `clé <operateur> valeur` d'un même bloc : l'ordre des
+    attributs n'a pas de sens en HCL ni dans les ressources Puppet. Une ligne qui
+    n'est pas une affectation complète (bloc ouvert, valeur sur plusieurs lignes)
+    interrompt la suite.
+    """
+    lignes, ligne = [], []
+    for jeton in jetons + [FIN_DE_LIGNE]:
+        if jeton == FIN_DE_LIGNE:
+            if ligne:
+                lignes.append(ligne)
+            ligne = []
+        else:
+            ligne.append(jeton)
+
+    def est_attribut(l):
+        if len(l) < 3 or l[1] != operateur:
+            return False
+        profondeur = 0
+        for jeton in l:
+            profondeur += (jeton in OUVRANTS) - (jeton in FERMANTS)
+            if profondeur < 0:
+                return False
+        return profondeur == 0
+
+    resultat, suite = [], []
+    for l in lignes:
+        if est_attribut(l):
+            suite.append([j for j in l if j != ','] if operateur == '=>' else l)
+            continue
+        resultat.extend(sorted(suite))
+        suite = []
+        resultat.append(l)
+    resultat.extend(sorted(suite))
+    return [jeton for l in resultat for jeton in l + [FIN_DE_LIGNE]]
+
+
+def normalise_hcl(code):
+    return _trie_attributs(_sans_virgule_finale(_jetons(code, 'hcl', '${')), '=')
+
+
+def normalise_yaml(code):
+    if yaml is not None:
+        try:
+            document = list(yaml.load_all(code, Loader=YamlLoader))
+            # Un fragment réduit à un scalaire ne dit rien de la structure : tokenizer
+            if any(isinstance(d, (dict, list)) for d in document):
+                return [json.dumps(document, sort_keys=True, default=str)]
+        except Exception:
+            pass
+    # Fragment non chargeable : jetons ligne à ligne, scalaires blocs gardés tels quels
+    jetons, bloc = [], None
+    for ligne in code.split('\n'):
+        contenu = ligne.strip()
+        indentation = len(ligne) - len(ligne.lstrip())
+        if bloc is not None and (not contenu or indentation > bloc):
+            jetons += ['lit:' + contenu, FIN_DE_LIGNE]
+            continue
+        bloc = indentation if DEBUT_BLOC_YAML.search(ligne) else None
+        jetons += _jetons(ligne, 'yaml', None) + [FIN_DE_LIGNE]
+    return _lignes_compactes(jetons)
+
+
+def normalise_ruby(code):
+    return _sans_virgule_finale(_jetons(code, 'ruby', '#{'))
+
+
+def normalise_puppet(code):
+    return _trie_attributs(_sans_virgule_finale(_jetons(code, 'puppet', '$')), '=>')
+
+
+NORMALISEURS = {
+    'hcl': normalise_hcl,
+    'yaml': normalise_yaml,
+    'ruby': normalise_ruby,
+    'puppet': normalise_puppet,
+}
+
+
+def forme_canonique(code, langage):
+    """Flux canonique du code sous forme de texte, ou None s'il n'y a pas de normaliseur pour ce langage."""
+    normaliseur = NORMALISEURS.get(langage)
+    if normaliseur is None:
+        return None
+    return '\x00'.join(normaliseur(code))
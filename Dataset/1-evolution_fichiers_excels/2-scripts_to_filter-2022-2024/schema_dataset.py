@@ -0,0 +1,161 @@
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from pandas.api.types import union_categoricals
+
+# === Paramètres ===
+# Colonnes des datasets commit/smell, telles qu'écrites dans les fichiers Excel
+COLONNES = [
+    'smell_category', 'commit_url', 'filepath',
+    'previous_lines', 'after_lines',
+    'previous_code', 'after_code', 'commit_message',
+    'year_2022', 'year_2023', 'year_2024'
+]
+ANNEES = ['year_2022', 'year_2023', 'year_2024']
+# Colonnes d'années des rapports : le bit i du masque `annees` correspond à ANNEES_RAPPORT[i]
+ANNEES_RAPPORT = ['year_2019', 'year_2020', 'year_2021', 'year_2022', 'year_2023', 'year_2024']
+
+# Schéma compact en mémoire : valeurs répétées encodées en catégories (dictionnaire + codes),
+# drapeaux d'années réunis dans un seul uint8
+COLONNES_CATEGORIELLES = ['smell_category', 'repo', 'commit_url', 'filepath']
+DEPOT_DEPUIS_URL = r'github\.com/([^/]+/[^/]+)/commit/'
+
+# Lignes lues puis traitées ensemble : la mémoire dépend de ce lot, pas de la taille du rapport
+TAILLE_LOT = 20000
+# Limite d'une cellule Excel (to_excel tronque de même)
+TAILLE_MAX_CELLULE = 32767
+# ===============================
+
+
+def masque_annees(annees):
+    """Masque des colonnes d'années données, à comparer avec la colonne `annees`."""
+    return sum(1 << ANNEES_RAPPORT.index(annee) for annee in annees)
+
+
+def compacte(df):
+    """
+    Passe au schéma compact : catégories pour smell_category, commit_url, filepath et
+    le dépôt extrait de l'URL ; les colonnes year_XXXX deviennent le masque `annees`.
+    """
+    df = df.copy()
+    masque = np.zeros(len(df), dtype=np.uint8)
+    for bit, annee in enumerate(ANNEES_RAPPORT):
+        if annee in df.columns:
+            masque |= (df[annee].to_numpy() == 1).astype(np.uint8) << bit
+            del df[annee]
+    df['annees'] = masque
+
+    if 'commit_url' in df.columns:
+        urls = df['commit_url'].astype('category')
+        depots = urls.cat.categories.str.extract(DEPOT_DEPUIS_URL, expand=False)
+        df['repo'] = urls.map(dict(zip(urls.cat.categories, depots)))
+    for colonne in COLONNES_CATEGORIELLES:
+        if colonne in df.columns:
+            df[colonne] = df[colonne].astype('category')
+    return df
+
+
+def decompacte(df, colonnes=COLONNES):
+    """Schéma des fichiers : colonnes year_XXXX à 0/1 et valeurs texte, dans l'ordre de `colonnes`."""
+    df = df.copy()
+    for colonne in COLONNES_CATEGORIELLES:
+        if colonne in df.columns and isinstance(df[colonne].dtype, pd.CategoricalDtype):
+            df[colonne] = df[colonne].astype(df[colonne].cat.categories.dtype)
+    if 'annees' in df.columns:
+        masque = df['annees'].to_numpy()
+        for bit, annee in enumerate(ANNEES_RAPPORT):
+            if annee in colonnes:
+                df[annee] = ((masque >> bit) & 1).astype(np.int64)
+    return df[colonnes]
+
+
+def concatene(lots, colonnes=None):
+    """pd.concat qui garde les catégories : les dictionnaires des lots sont d'abord unifiés."""
+    lots = [lot for lot in lots if lot is not None]
+    if not lots:
+        return pd.DataFrame(columns=colonnes or COLONNES)
+    for colonne in COLONNES_CATEGORIELLES:
+        if colonne in lots[0].columns and isinstance(lots[0][colonne].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([lot[colonne] for lot in lots]).categories
+            for lot in lots:
+                lot[colonne] = lot[colonne].cat.set_categories(categories)
+    return pd.concat(lots)
+
+
+# === Lecture et écriture ===
+
+def charge_par_lots(filepath_excel, colonnes=COLONNES, taille_lot=TAILLE_LOT, annees=None):
+    """
+    Lit le fichier en lecture seule, ligne à ligne, et renvoie des DataFrames compacts
+    d'au plus `taille_lot` lignes restreints à `colonnes`. Avec `annees`, les lignes sans
+    aucune de ces années à 1 sont écartées dès la lecture. L'index reprend le numéro de
+    ligne du fichier, comme avec pd.read_excel.
+    """
+    classeur = load_workbook(filepath_excel, read_only=True, data_only=True)
+    try:
+        lignes = classeur.active.iter_rows(values_only=True)
+        entete = list(next(lignes, ()))
+        manquantes = [c for c in colonnes if c not in entete]
+        if manquantes:
+            raise ValueError(f"{filepath_excel} : colonnes absentes {manquantes}")
+        positions = [entete.index(c) for c in colonnes]
+        positions_annees = [entete.index(a) for a in annees or []]
+
+        lot, index = [], []
+        for numero, ligne in enumerate(lignes):
+            if positions_annees and not any(ligne[i] == 1 for i in positions_annees):
+                continue
+            lot.append([ligne[i] for i in positions])
+            index.append(numero)
+            if len(lot) == taille_lot:
+                yield compacte(pd.DataFrame(lot, columns=colonnes, index=index))
+                lot, index = [], []
+        if lot:
+            yield compacte(pd.DataFrame(lot, columns=colonnes, index=index))
+    finally:
+        classeur.close()
+
+
+def charge_dataset(filepath_excel, colonnes=COLONNES, annees=None):
+    """Fichier entier au schéma compact."""
+    return concatene(charge_par_lots(filepath_excel, colonnes, annees=annees), colonnes)
+
+
+def _cellule(valeur):
+    if isinstance(valeur, float) and np.isnan(valeur):
+        return None
+    if isinstance(valeur, str) and len(valeur) > TAILLE_MAX_CELLULE:
+        return valeur[:TAILLE_MAX_CELLULE]
+    return valeur
+
+
+class ClasseurEnFlux:
+    """Classeur openpyxl en écriture seule, rempli lot par lot au schéma des fichiers."""
+
+    def __init__(self, chemin, colonnes=COLONNES):
+        self.chemin = chemin
+        self.colonnes = colonnes
+        self.lignes = 0
+        self.classeur = Workbook(write_only=True)
+        self.feuille = self.classeur.create_sheet()
+        self.feuille.append(list(colonnes))
+
+    def ajoute(self, df):
+        for ligne in decompacte(df, self.colonnes).itertuples(index=False, name=None):
+            self.feuille.append([_cellule(v) for v in ligne])
+        self.lignes += len(df)
+
+    def ferme(self):
+        dossier = os.path.dirname(self.chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        self.classeur.save(self.chemin)
+
+
+def ecrit_dataset(df, chemin, colonnes=COLONNES):
+    sortie = ClasseurEnFlux(chemin, colonnes)
+    sortie.ajoute(df)
+    sortie.ferme()
+    return sortie.lignes
@@ -1,11 +1,32 @@
 import os
 import json
 import re
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
 # Dossier contenant les fichiers JSON de scan
 OUTPUT_DIR = r"C:\\Users\\DELL\\Documents\\test_snyk\\test4"
 SUMMARY_FILE = os.path.join(OUTPUT_DIR, "snyk_scan_summary.xlsx")
+# Comptes déjà calculés (taille, mtime, nb) : un fichier inchangé n'est pas relu
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, "snyk_scan_summary_manifest.json")
+WORKERS = os.cpu_count() or 4
+TAILLE_BLOC = 1 << 20
+# Premier bloc lu en flux pour chercher "vulnerabilities" avant de charger le fichier
+TAILLE_SONDE = 64 << 10
+# Au-delà, un fichier dont le premier bloc ne suffit pas est lu en flux jusqu'au bout ;
+# en deçà, json.load (en C) le parcourt plus vite que le tokenizer
+CHARGEMENT_MAX = 64 << 20
+
+# Jetons utiles au comptage ; le reste (blancs, virgules) est sauté par le moteur regex,
+# tout autre caractère hors chaîne rend le fichier invalide comme pour json.load.
+# Une chaîne non terminée en fin de bloc est reconnue (groupe "ferme" vide) pour relire la suite.
+JETON_JSON = re.compile(r'''
+    (?P<chaine>"(?:[^"\\]|\\.)*)(?:(?P<ferme>")(?P<cle>\s*:)?|\\?\Z)
+  | (?P<struct>[\[\]{}])
+  | (?P<scalaire>-?\d[\d.eE+\-]*|true|false|null)
+  | (?P<invalide>[^\s,])
+''', re.VERBOSE)
+
 
 def extract_info_from_filename(filename):
     """
@@ -19,39 +40,197 @@ def extract_info_from_filename(filename):
         return repo, sha, scan_type
     return None, None, None
 
+
+class _Abandon(Exception):
+    """Réponse absente des premiers blocs lus."""
+
+
+def _jetons(f, taille_bloc=TAILLE_BLOC, max_blocs=None):
+    """Jetons JSON lus bloc par bloc : (nature, texte, est_une_cle)."""
+    tampon, fin, lus = "", False, 0
+    while True:
+        if not fin:
+            bloc = f.read(taille_bloc)
+            fin = not bloc
+            if bloc and lus == max_blocs:
+                raise _Abandon()
+            lus += 1
+            tampon += bloc
+        position = 0
+        # Un jeton qui se termine avant la dernière virgule ou accolade/crochet du tampon est
+        # complet ; au-delà il peut être coupé (chaîne ouverte, clé dont le ':' n'est pas encore
+        # lu, nombre ou littéral tronqué) et sera relu avec le bloc suivant
+        limite = max(tampon.rfind(c) for c in ',[]{}') + 1
+        for m in JETON_JSON.finditer(tampon):
+            if not fin and m.end() >= limite:
+                break
+            position = m.end()
+            if m.group("chaine") is not None:
+                if not m.group("ferme"):
+                    raise ValueError("chaîne JSON non terminée")
+                yield "chaine", m.group("chaine") + '"', m.group("cle") is not None
+            elif m.group("invalide") is not None:
+                raise ValueError(f"caractère inattendu {m.group('invalide')!r}")
+            elif m.group("struct") is not None:
+                yield "struct", m.group("struct"), False
+            else:
+                yield "scalaire", m.group("scalaire"), False
+        if fin:
+            return
+        tampon = tampon[position:]
+
+
+def _count_loaded(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+        if isinstance(data, dict):
+            if "vulnerabilities" in data:
+                return len(data["vulnerabilities"])
+            elif "summary" in data and "totalIssues" in data["summary"]:
+                return data["summary"]["totalIssues"]
+    return 0
+
+
+def _count_streamed(f, taille_bloc=TAILLE_BLOC, max_blocs=None):
+    """
+    Objet racine lu jeton par jeton : on suit la profondeur et on s'arrête dès que
+    la valeur de "vulnerabilities" est refermée (c'est elle qui prime sur "summary").
+    """
+    profondeur = 0
+    cle = None              # dernière clé lue au niveau de l'objet racine
+    cle_resume = None       # dernière clé lue dans "summary"
+    conteneur = None        # '[' ou '{' : valeur de "vulnerabilities" en cours de comptage
+    vulnerabilites = 0
+    total = None
+    ferme = False
+    for nature, texte, est_cle in _jetons(f, taille_bloc, max_blocs):
+        if ferme:
+            raise ValueError("données après l'objet racine")
+        if nature == "struct":
+            if texte in "[{":
+                if profondeur == 1 and cle == "vulnerabilities":
+                    conteneur = texte
+                elif profondeur == 2 and conteneur == "[":
+                    vulnerabilites += 1
+                profondeur += 1
+                continue
+            profondeur -= 1
+            if profondeur == 1:
+                if conteneur is not None:
+                    return vulnerabilites
+                cle = None
+            ferme = profondeur == 0
+            continue
+        if profondeur == 1:
+            if est_cle:
+                cle = json.loads(texte)
+            elif cle == "vulnerabilities":
+                return len(json.loads(texte))  # chaîne : len() ; nombre ou null : TypeError -> -1
+        elif profondeur == 2 and conteneur is not None:
+            if est_cle == (conteneur == "{"):  # éléments d'une liste, clés d'un objet
+                vulnerabilites += 1
+        elif profondeur == 2 and cle == "summary":
+            if est_cle:
+                cle_resume = json.loads(texte)
+            elif cle_resume == "totalIssues":
+                total = json.loads(texte)
+    if not ferme:
+        raise ValueError("fichier JSON tronqué")
+    return total if total is not None else 0
+
+
 def count_vulnerabilities(filepath):
+    """
+    Même résultat que len(data["vulnerabilities"]) ou data["summary"]["totalIssues"]
+    après json.load. Le début d'un objet est lu en flux : "vulnerabilities" arrive en
+    tête des résultats IaC, on s'arrête dès sa fin sans lire les issues qui suivent.
+    Si ce premier bloc ne suffit pas (SARIF de snyk code) ou pour les autres contenus
+    (listes, messages d'erreur de la CLI) : json.load, ou lecture en flux complète
+    au-delà de CHARGEMENT_MAX.
+    """
     try:
         with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                if "vulnerabilities" in data:
-                    return len(data["vulnerabilities"])
-                elif "summary" in data and "totalIssues" in data["summary"]:
-                    return data["summary"]["totalIssues"]
+            if f.read(64).lstrip().startswith("{"):
+                f.seek(0)
+                if os.path.getsize(filepath) > CHARGEMENT_MAX:
+                    return _count_streamed(f)
+                try:
+                    return _count_streamed(f, TAILLE_SONDE, max_blocs=1)
+                except _Abandon:
+                    pass
+        return _count_loaded(filepath)
     except Exception as e:
         return -1
-    return 0
 
-def generate_summary_from_folder(folder):
+
+def _compte(args):
+    filename, full_path = args
+    return filename, count_vulnerabilities(full_path)
+
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    temporaire = path + ".tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(temporaire, path)
+
+
+def generate_summary_from_folder(folder, manifest=None, workers=WORKERS):
+    """
+    Résumé des scans du dossier. Les fichiers dont (taille, mtime) n'a pas changé
+    depuis le manifeste gardent leur compte ; les autres sont comptés en parallèle.
+    Le manifeste est mis à jour sur place.
+    """
+    manifest = {} if manifest is None else manifest
     entries = []
-    for filename in os.listdir(folder):
+    a_compter = []
+    for entree in os.scandir(folder):
+        filename = entree.name
         if filename.startswith("snyk-") and filename.endswith(".json"):
-            full_path = os.path.join(folder, filename)
             repo, sha, scan_type = extract_info_from_filename(filename)
             if repo and sha and scan_type:
-                nb_vuln = count_vulnerabilities(full_path)
+                stat = entree.stat()
+                connu = manifest.get(filename)
+                if not connu or connu["size"] != stat.st_size or connu["mtime"] != stat.st_mtime:
+                    manifest[filename] = {"size": stat.st_size, "mtime": stat.st_mtime, "count": None}
+                    a_compter.append((filename, entree.path))
                 entries.append({
                     "repo": repo,
                     "commit_sha": sha,
                     "scan_type": scan_type,
-                    "nb_vulnerabilities": nb_vuln,
                     "file": filename
                 })
-    return pd.DataFrame(entries)
 
-# Génération du résumé
-df_summary = generate_summary_from_folder(OUTPUT_DIR)
+    if a_compter:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for filename, nb_vuln in pool.map(_compte, a_compter, chunksize=16):
+                manifest[filename]["count"] = nb_vuln
+    print(f"{len(a_compter)} fichiers comptés, {len(entries) - len(a_compter)} repris du manifeste")
+
+    # Fichiers disparus du dossier : inutile de les garder
+    presents = {entry["file"] for entry in entries}
+    for filename in [f for f in manifest if f not in presents]:
+        del manifest[filename]
+
+    for entry in entries:
+        entry["nb_vulnerabilities"] = manifest[entry["file"]]["count"]
+    return pd.DataFrame(entries, columns=["repo", "commit_sha", "scan_type", "nb_vulnerabilities", "file"])
+
+
+if __name__ == "__main__":
+    # Génération du résumé
+    manifest = load_manifest()
+    df_summary = generate_summary_from_folder(OUTPUT_DIR, manifest)
+    save_manifest(manifest)
 
-# Sauvegarde du fichier .xlsx
-df_summary.to_excel(SUMMARY_FILE, index=False)
-print(f"✅ Résumé exporté : {SUMMARY_FILE}")
+    # Sauvegarde du fichier .xlsx
+    df_summary.to_excel(SUMMARY_FILE, index=False)
+    print(f"✅ Résumé exporté : {SUMMARY_FILE}")
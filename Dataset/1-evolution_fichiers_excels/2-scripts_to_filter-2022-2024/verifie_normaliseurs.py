@@ -0,0 +1,45 @@
+"""
+Vérifications de normaliseurs.forme_canonique : paires de fragments qui doivent
+(ou ne doivent pas) être jugées équivalentes par le filtre des modifications sans effet.
+Usage : python verifie_normaliseurs.py
+"""
+import sys
+
+from normaliseurs import forme_canonique
+
+# === Paramètres ===
+# (description, langage, avant, après, équivalents attendus)
+CAS = [
+    ('hcl : ordre des attributs', 'hcl',
+     'b = 2\na = 1\n', 'a = 1\nb = 2\n', True),
+    ('hcl : commentaire retiré', 'hcl',
+     'a = 1 # ancien\n', 'a = 1\n', True),
+    ('hcl : URL modifiée dans un heredoc', 'hcl',
+     'user_data = <<EOF\ncurl https://evil.example\nEOF\n',
+     'user_data = <<EOF\ncurl https://good.example\nEOF\n', False),
+    ('hcl : lignes de variables réordonnées dans un heredoc', 'hcl',
+     'user_data = <<-EOF\n  A=1\n  B=2\n  EOF\n',
+     'user_data = <<-EOF\n  B=2\n  A=1\n  EOF\n', False),
+    ('yaml : ordre des clés', 'yaml',
+     'a: 1\nb: 2\n', 'b: 2\na: 1\n', True),
+    ('yaml : montée de version', 'yaml',
+     'k8s_version: 1.1\n', 'k8s_version: 1.10\n', False),
+    ('yaml : permissions octales', 'yaml',
+     'mode: 0644\n', 'mode: 420\n', False),
+]
+# ===============================
+
+
+def verifie(cas=CAS):
+    echecs = 0
+    for description, langage, avant, apres, attendu in cas:
+        equivalents = forme_canonique(avant, langage) == forme_canonique(apres, langage)
+        ok = equivalents == attendu
+        echecs += not ok
+        print(f"{'OK   ' if ok else 'ECHEC'} {description} (équivalents : {equivalents})")
+    print(f"\n{len(cas) - echecs}/{len(cas)} vérifications réussies")
+    return echecs
+
+
+if __name__ == "__main__":
+    sys.exit(1 if verifie() else 0)
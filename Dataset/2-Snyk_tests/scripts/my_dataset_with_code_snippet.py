@@ -4,8 +4,14 @@ import requests
 import base64
 import re
 import os
+import sys
 from urllib.parse import urlparse
 
+# Couche HTTP partagée avec extract.py (pool keep-alive, quota, cache SQLite)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "0-test"))
+import blob_store
+from github_api import safe_get, add_tokens
+
 # --- Configuration ---
 # Token GitHub (TRÈS IMPORTANT)
 # REMPLACEZ "VOTRE_TOKEN_ICI" par votre véritable token ou lisez-le depuis une variable d'environnement.
@@ -19,6 +25,8 @@ HEADERS = {
     'Authorization': f'token {GITHUB_TOKEN}',
     'Accept': 'application/vnd.github.v3+json',
 }
+# Pool de jetons partagé avec extract.py : GITHUB_TOKENS ou 0-test/github_tokens.txt
+add_tokens([GITHUB_TOKEN])
 
 # Nombre de lignes de contexte si 'line' est un seul numéro
 CONTEXT_LINES_FOR_SINGLE_LINE = 2
@@ -50,13 +58,23 @@ def get_file_content_at_commit(owner, repo, filepath, sha):
         return None, f"Paramètres manquants pour l'API : owner={owner}, repo={repo}, path={filepath}, sha={sha}"
     
     api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{filepath}?ref={sha}"
+    response = None
     try:
-        response = requests.get(api_url, headers=HEADERS, timeout=20)
+        # Version déjà vue par extract.py ou par un script précédent : pas d'appel à l'API Contents
+        stored = blob_store.fetch_file(owner, repo, sha, filepath, HEADERS)
+        if stored is not None:
+            return stored.decode('utf-8'), None
+
+        response = safe_get(api_url, headers=HEADERS)
+        if response is None:
+            return None, f"Echec de la connexion à l'API pour {filepath} à {sha} pour {api_url}"
         response.raise_for_status()
         data = response.json() # Stocker la réponse JSON
         content_base64 = data.get('content')
         if content_base64:
-            return base64.b64decode(content_base64).decode('utf-8'), None
+            raw = base64.b64decode(content_base64)
+            blob_store.put_file(owner, repo, sha, filepath, raw, data.get('sha'))
+            return raw.decode('utf-8'), None
         else:
             file_type = data.get('type')
             if file_type == 'dir':
@@ -64,6 +82,8 @@ def get_file_content_at_commit(owner, repo, filepath, sha):
             # Si 'content' est manquant mais que ce n'est pas un dossier, et pas d'erreur HTTP, c'est étrange
             return None, "Contenu non trouvé dans la réponse JSON (champ 'content' manquant ou vide)."
     except requests.exceptions.HTTPError as http_err:
+        if response is None:  # erreur levée par le store de blobs
+            return None, f"Erreur HTTP lors de la récupération du fichier : {http_err} pour {api_url}"
         if response.status_code == 404:
             return None, f"Fichier non trouvé (404) : {filepath} au commit {sha} dans {owner}/{repo}."
         elif response.status_code == 403:
@@ -76,10 +96,8 @@ def get_file_content_at_commit(owner, repo, filepath, sha):
              except json.JSONDecodeError: # Si la réponse d'erreur n'est pas JSON
                 return None, f"Erreur HTTP 403 (Forbidden) : {filepath} au commit {sha}. Réponse non-JSON: {response.text}"
         return None, f"Erreur HTTP lors de la récupération du fichier : {http_err} pour {api_url}"
-    except requests.exceptions.Timeout:
-        return None, f"Timeout lors de la récupération du fichier {filepath} à {sha} pour {api_url}"
     except json.JSONDecodeError: # Si la réponse initiale n'est pas un JSON valide (avant même de chercher 'content')
-        return None, f"Réponse non-JSON de l'API pour {filepath} à {sha} pour {api_url}. Contenu: {response.text[:200]}"
+        return None, f"Réponse non-JSON de l'API pour {filepath} à {sha} pour {api_url}. Contenu: {response.text[:200] if response is not None else ''}"
     except Exception as e:
         return None, f"Erreur lors de la récupération du contenu du fichier {filepath} à {sha}: {e} pour {api_url}"
 
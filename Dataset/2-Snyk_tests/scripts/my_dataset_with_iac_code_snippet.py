@@ -3,8 +3,14 @@ import requests
 import base64
 import re
 import os
+import sys
 from urllib.parse import urlparse
 
+# Couche HTTP partagée avec extract.py (pool keep-alive, quota, cache SQLite)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "0-test"))
+import blob_store
+from github_api import safe_get, add_tokens, pool_size
+
 # --- Configuration ---
 # Token GitHub (TRÈS IMPORTANT)
 GITHUB_TOKEN = "YOUR_GITHUB_TOKEN"
@@ -15,6 +21,8 @@ HEADERS = {
     'Authorization': f'token {GITHUB_TOKEN}',
     'Accept': 'application/vnd.github.v3+json',
 }
+# Pool de jetons partagé avec extract.py : GITHUB_TOKENS ou 0-test/github_tokens.txt
+add_tokens([GITHUB_TOKEN])
 
 # Nombre de lignes de contexte si la 'line_number' est un seul numéro
 CONTEXT_LINES_FOR_SINGLE_LINE = 2
@@ -46,18 +54,30 @@ def get_file_content_at_commit(owner, repo, filepath, sha):
         return None, f"Paramètres manquants pour l'API : owner={owner}, repo={repo}, path={filepath}, sha={sha}"
     
     api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{filepath}?ref={sha}"
+    response = None
     try:
-        response = requests.get(api_url, headers=HEADERS, timeout=20)
+        # Version déjà vue par extract.py ou par un script précédent : pas d'appel à l'API Contents
+        stored = blob_store.fetch_file(owner, repo, sha, filepath, HEADERS)
+        if stored is not None:
+            return stored.decode('utf-8'), None
+
+        response = safe_get(api_url, headers=HEADERS)
+        if response is None:
+            return None, f"Echec de la connexion à l'API pour {filepath} à {sha} pour {api_url}"
         response.raise_for_status()
         content_base64 = response.json().get('content')
         if content_base64:
-            return base64.b64decode(content_base64).decode('utf-8'), None
+            raw = base64.b64decode(content_base64)
+            blob_store.put_file(owner, repo, sha, filepath, raw, response.json().get('sha'))
+            return raw.decode('utf-8'), None
         else:
             file_type = response.json().get('type')
             if file_type == 'dir':
                 return None, f"Le chemin '{filepath}' est un répertoire, pas un fichier."
             return None, "Contenu vide ou fichier non trouvé (pas de champ 'content')."
     except requests.exceptions.HTTPError as http_err:
+        if response is None:  # erreur levée par le store de blobs
+            return None, f"Erreur HTTP lors de la récupération du fichier : {http_err} pour {api_url}"
         if response.status_code == 404:
             return None, f"Fichier non trouvé (404) : {filepath} au commit {sha} dans {owner}/{repo}."
         elif response.status_code == 403:
@@ -70,8 +90,6 @@ def get_file_content_at_commit(owner, repo, filepath, sha):
              except:
                 return None, f"Erreur HTTP 403 (Forbidden) : {filepath} au commit {sha}. Détails: {str(http_err)}"
         return None, f"Erreur HTTP lors de la récupération du fichier : {http_err} pour {api_url}"
-    except requests.exceptions.Timeout:
-        return None, f"Timeout lors de la récupération du fichier {filepath} à {sha} pour {api_url}"
     except Exception as e:
         return None, f"Erreur lors de la récupération du contenu du fichier {filepath} à {sha}: {e} pour {api_url}"
 
@@ -363,8 +381,8 @@ NUM_ROWS_TO_TEST_IAC_FINAL = None # Mettre à None pour traiter toutes les ligne
 # --------------------
 
 if __name__ == "__main__":
-    if not GITHUB_TOKEN or len(GITHUB_TOKEN) < 20:
-        print("ERREUR CRITIQUE : Le token d'accès personnel GitHub n'est pas configuré ou semble invalide.")
+    if pool_size() == 0:
+        print("ERREUR CRITIQUE : Aucun token d'accès personnel GitHub configuré (GITHUB_TOKEN, GITHUB_TOKENS ou github_tokens.txt).")
     else:
         process_iac_report_for_snippets_v3(
             INPUT_EXCEL_IAC_ENRICHED_V3, 
@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# === CONFIGURATION ===
+# État des scans Snyk, conservé d'un run à l'autre : une ligne par (dépôt, sha, type de scan)
+STATE_DB = "scan_state.sqlite"
+# Attente maximale (secondes) d'un écrivain quand un autre tient le verrou d'écriture
+BUSY_TIMEOUT = 30
+
+_connections = threading.local()
+
+
+def open_scan_state(path=STATE_DB):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL : une transaction validée survit à l'arrêt du script, seul un arrêt du système peut perdre la dernière
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS commits (repo TEXT, sha TEXT, checkout_error TEXT,
+                                            repo_not_found INTEGER DEFAULT 0, updated_at TEXT,
+                                            PRIMARY KEY (repo, sha));
+        CREATE TABLE IF NOT EXISTS scans (repo TEXT, sha TEXT, scan_type TEXT, success INTEGER, updated_at TEXT,
+                                          PRIMARY KEY (repo, sha, scan_type));
+        CREATE TABLE IF NOT EXISTS tree_scans (tree_hash TEXT, scan_type TEXT, report TEXT, updated_at TEXT,
+                                               PRIMARY KEY (tree_hash, scan_type));
+    """)
+    conn.commit()
+    return conn
+
+
+def thread_connection(path=STATE_DB):
+    """Connexion propre au thread appelant (les objets sqlite3 ne se partagent pas entre threads)."""
+    conns = getattr(_connections, "conns", None)
+    if conns is None:
+        conns = _connections.conns = {}
+    if path not in conns:
+        conns[path] = open_scan_state(path)
+    return conns[path]
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def is_empty(conn):
+    return conn.execute("SELECT 1 FROM commits UNION ALL SELECT 1 FROM scans LIMIT 1").fetchone() is None
+
+
+def import_json_cache(conn, cache_file, scan_types):
+    """
+    Reprend l'ancien cache JSON ({dépôt: {sha: {drapeaux}}}) dans une base vide.
+    Drapeaux lus : <type>_scanned_successfully ou <type>_scanned, checkout_error,
+    repo_not_found_locally. Renvoie le nombre de commits repris.
+    """
+    if not os.path.exists(cache_file) or not is_empty(conn):
+        return 0
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except json.JSONDecodeError:
+        print(f"Avertissement : Le fichier cache '{cache_file}' est corrompu, il n'est pas repris.")
+        return 0
+
+    now = _now()
+    commits, scans = [], []
+    for repo, shas in cache.items():
+        for sha, entry in shas.items():
+            commits.append((repo, str(sha), entry.get("checkout_error"), int(bool(entry.get("repo_not_found_locally"))), now))
+            for scan_type in scan_types:
+                success = entry.get(f"{scan_type}_scanned_successfully", entry.get(f"{scan_type}_scanned"))
+                if success is not None:
+                    scans.append((repo, str(sha), scan_type, int(bool(success)), now))
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?)", commits)
+        conn.executemany("INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?)", scans)
+    return len(commits)
+
+
+def add_commits(conn, commits):
+    """Enregistre les (dépôt, sha) à scanner ; ceux déjà connus gardent leur état."""
+    now = _now()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO commits (repo, sha, updated_at) VALUES (?, ?, ?)",
+            [(repo, str(sha), now) for repo, sha in commits],
+        )
+
+
+def commit_state(conn, repo, sha):
+    """État d'un commit : {"checkout_error", "repo_not_found", "scanned": {type: succès}}."""
+    row = conn.execute(
+        "SELECT checkout_error, repo_not_found FROM commits WHERE repo = ? AND sha = ?", (repo, str(sha))
+    ).fetchone()
+    scanned = dict(conn.execute(
+        "SELECT scan_type, success FROM scans WHERE repo = ? AND sha = ?", (repo, str(sha))
+    ).fetchall())
+    return {
+        "checkout_error": row[0] if row else None,
+        "repo_not_found": bool(row and row[1]),
+        "scanned": {scan_type: bool(success) for scan_type, success in scanned.items()},
+    }
+
+
+def record_scans(conn, repo, sha, results):
+    """Enregistre le succès ou l'échec de chaque type de scan, en une transaction."""
+    now = _now()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?, ?)",
+            [(repo, str(sha), scan_type, int(bool(success)), now) for scan_type, success in results.items()],
+        )
+
+
+def mark_commit(conn, repo, sha, checkout_error=None, repo_not_found=False):
+    """Erreur d'extraction (None : extraction réussie) ou dépôt introuvable pour ce commit."""
+    with conn:
+        conn.execute(
+            "INSERT INTO commits VALUES (?, ?, ?, ?, ?) ON CONFLICT (repo, sha) DO UPDATE SET "
+            "checkout_error = excluded.checkout_error, repo_not_found = excluded.repo_not_found, "
+            "updated_at = excluded.updated_at",
+            (repo, str(sha), checkout_error, int(repo_not_found), _now()),
+        )
+
+
+def tree_reports(conn, tree_hash):
+    """Rapports réussis déjà obtenus pour une empreinte d'arbre : {type de scan: chemin du rapport}."""
+    return dict(conn.execute("SELECT scan_type, report FROM tree_scans WHERE tree_hash = ?", (tree_hash,)).fetchall())
+
+
+def record_tree_reports(conn, tree_hash, reports):
+    """Associe les rapports d'un scan réussi à l'empreinte ; le premier rapport enregistré est gardé."""
+    now = _now()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO tree_scans VALUES (?, ?, ?, ?)",
+            [(tree_hash, scan_type, report, now) for scan_type, report in reports.items()],
+        )
+
+
+def pending_commits(conn, scan_types):
+    """
+    Commits enregistrés qui restent à scanner : au moins un type de scan sans succès,
+    ni erreur d'extraction ni dépôt introuvable. Ordre d'enregistrement.
+    """
+    marks = ", ".join("?" for _ in scan_types)
+    return conn.execute(f"""
+        SELECT c.repo, c.sha FROM commits c
+        WHERE c.checkout_error IS NULL AND NOT c.repo_not_found
+          AND (SELECT COUNT(*) FROM scans s
+               WHERE s.repo = c.repo AND s.sha = c.sha AND s.success AND s.scan_type IN ({marks})) < ?
+        ORDER BY c.rowid
+    """, (*scan_types, len(scan_types))).fetchall()
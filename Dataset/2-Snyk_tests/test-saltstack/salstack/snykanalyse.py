@@ -6,10 +6,15 @@ import sys
 import stat
 import pandas as pd
 
+import scan_state
+
 # === CONFIGURATION ===
 OUTPUT_DIR = "."
 EXCEL_FILE = "dataset_saltstack_avec_repos.xlsx"
+# État des scans (SQLite), clé (URL du dépôt, sha, type de scan) ; l'ancien cache JSON y est repris
+STATE_DB = os.path.join(OUTPUT_DIR, "scan_cache.sqlite")
 CACHE_FILE = os.path.join(OUTPUT_DIR, "scan_cache.json")
+SCAN_TYPES = ["code", "iac"]
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -52,19 +57,10 @@ def safe_run_snyk(command, output_file, cwd):
             json.dump({"error": str(e)}, fout, indent=2)
         return False
 
-# === CACHE ===
-
-def load_scan_cache():
-    if os.path.exists(CACHE_FILE):
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_scan_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2)
+# === ÉTAT DES SCANS ===
 
-scan_cache = load_scan_cache()
+scan_db = scan_state.open_scan_state(STATE_DB)
+scan_state.import_json_cache(scan_db, CACHE_FILE, SCAN_TYPES)
 
 # === SCAN ===
 
@@ -74,13 +70,12 @@ def run_snyk_scan(repo_url, commit_sha):
     repo_name = get_repo_name(repo_url)
     short_sha = commit_sha[:7]
 
-    repo_cache = scan_cache.get(repo_url, {})
-    sha_cache = repo_cache.get(commit_sha, {})
+    scanned = scan_state.commit_state(scan_db, repo_url, commit_sha)["scanned"]
 
     code_output = os.path.join(OUTPUT_DIR, f"snyk-code-{repo_name}-{short_sha}.json")
     iac_output = os.path.join(OUTPUT_DIR, f"snyk-iac-{repo_name}-{short_sha}.json")
 
-    if sha_cache.get("code_scanned") and sha_cache.get("iac_scanned"):
+    if scanned.get("code") and scanned.get("iac"):
         print(f"✅ Déjà scanné : {repo_name}@{short_sha}")
         return
 
@@ -97,17 +92,17 @@ def run_snyk_scan(repo_url, commit_sha):
 
     subprocess.run(["git", "checkout", commit_sha], cwd=folder)
 
-    scan_cache.setdefault(repo_url, {}).setdefault(commit_sha, {})
+    scan_state.add_commits(scan_db, [(repo_url, commit_sha)])
 
-    if not sha_cache.get("code_scanned"):
+    if not scanned.get("code"):
         print(f"⚙️  Scan Snyk CODE...")
         success = safe_run_snyk(["snyk", "code", "test", "--json"], code_output, cwd=folder)
-        scan_cache[repo_url][commit_sha]["code_scanned"] = success
+        scan_state.record_scans(scan_db, repo_url, commit_sha, {"code": success})
 
-    if not sha_cache.get("iac_scanned"):
+    if not scanned.get("iac"):
         print(f"⚙️  Scan Snyk IaC...")
         success = safe_run_snyk(["snyk", "iac", "test", "--json"], iac_output, cwd=folder)
-        scan_cache[repo_url][commit_sha]["iac_scanned"] = success
+        scan_state.record_scans(scan_db, repo_url, commit_sha, {"iac": success})
 
 # === EXECUTION ===
 
@@ -126,5 +121,5 @@ if __name__ == "__main__":
         print(f"\n🟦 [{i+1}/{total}] Dépôt : {repo} | Commit : {sha}")
         run_snyk_scan(repo.strip(), sha.strip())
 
-    save_scan_cache(scan_cache)
+    scan_db.close()
     print("\n✅ Tous les scans terminés.")
@@ -1,11 +1,19 @@
+import hashlib
 import os
 import subprocess
 import json
 import shutil # Pour shutil.which
 import sys
 import stat
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 
+import scan_state
+
 # === CONFIGURATION ===
 # Répertoire où les rapports Snyk JSON seront sauvegardés
 OUTPUT_DIR = "."
@@ -19,8 +27,34 @@ REPOS_PARENT_DIR = "." # Par défaut, le répertoire courant. Adaptez si vos dé
 REPO_FOLDER_NAME_COLUMN = "nom_dossier" # Colonne contenant le nom du dossier du dépôt local
 COMMIT_SHA_COLUMN = "commit_sha"       # Colonne contenant le SHA du commit
 
+# État des scans (SQLite), clé (chemin absolu du dépôt, sha, type de scan)
+STATE_DB = os.path.join(OUTPUT_DIR, "scan_state.sqlite")
+# Ancien cache JSON, repris dans la base au premier lancement
 CACHE_FILE = os.path.join(OUTPUT_DIR, "scan_specific_commits_cache.json")
 
+# Scans en parallèle : chaque commit en cours est extrait dans son propre worktree git,
+# le dépôt cloné n'est jamais modifié. Chaque tâche lance un processus snyk par type de scan.
+SCAN_WORKERS = 4
+# Types de scan lancés ensemble sur chaque commit : arguments snyk (rapport snyk-<type>-<dépôt>-<sha>.json)
+SCAN_TYPES = {
+    "code": ["code", "test", "--json"],
+    "iac": ["iac", "test", "--json"],
+}
+# Rapports repris d'un commit à l'autre d'un même dépôt, par type de scan :
+# - iac : fichiers IAC_EXTENSIONS et SNAPSHOT_ALWAYS identiques (mêmes chemins, mêmes blobs) ;
+# - code : arbre complet identique, snyk code lisant tous les langages du dépôt.
+# Extensions lues par snyk iac (Terraform, CloudFormation, Kubernetes, ARM) et celles du dataset
+IAC_EXTENSIONS = ('.tf', '.tfvars', '.hcl', '.json', '.yml', '.yaml', '.template', '.pp', '.sls', '.rb', '.py')
+# Snapshots restreints : au lieu du dépôt entier, snyk ne voit que les fichiers modifiés par le
+# commit (git diff-tree), les fichiers IAC_EXTENSIONS de leurs dossiers (module Terraform,
+# états Salt voisins...) et SNAPSHOT_ALWAYS. Un commit sans fichier modifié (merge) est scanné en entier.
+SCOPED_SNAPSHOTS = False
+SNAPSHOT_ALWAYS = ('.snyk',)
+# Chemins passés par commande git (limite de longueur des lignes de commande)
+GIT_PATHS_PER_CALL = 500
+# Dossier des worktrees temporaires (tmpfs quand il existe), supprimés après chaque scan
+WORKTREE_DIR = os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "snyk_worktrees")
+
 # S'assurer que le dossier de sortie pour les rapports Snyk existe
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -40,6 +74,11 @@ if not SNYK_PATH:
 else:
     print(f"Utilisation de snyk trouvé à : {SNYK_PATH}")
 
+# Environnement git sans variables qui forceraient un autre dépôt ou index
+GIT_ENV = os.environ.copy()
+for git_var in ['GIT_DIR', 'GIT_WORK_TREE', 'GIT_INDEX_FILE', 'GIT_ALTERNATE_OBJECT_DIRECTORIES', 'GIT_OBJECT_DIRECTORY']:
+    GIT_ENV.pop(git_var, None)
+
 
 # === UTILS ===
 def handle_remove_readonly(func, path, exc): # Peut être utile si des scripts futurs suppriment des dossiers
@@ -101,131 +140,349 @@ def safe_run_snyk_command(snyk_args, output_file, cwd):
             json.dump({"python_error": str(e), "command": " ".join(full_command if 'full_command' in locals() else snyk_args)}, fout, indent=2)
         return False
 
-# === CACHE ===
-def load_scan_cache():
-    if os.path.exists(CACHE_FILE):
+# === ÉTAT DES SCANS ===
+# Chaque thread de scan écrit dans la base par sa propre connexion (WAL : écrivains sérialisés
+# par SQLite, lecteurs jamais bloqués) ; chaque mise à jour est une transaction
+def state_conn():
+    return scan_state.thread_connection(STATE_DB)
+
+# === GIT ===
+# Les commandes git qui écrivent dans le dépôt (worktree add/remove, fetch) sont sérialisées
+# par dépôt ; les scans, eux, tournent en parallèle dans des worktrees distincts
+_repo_locks = {}
+_repo_locks_guard = threading.Lock()
+_safe_directories = set()
+
+def repo_lock(abs_repo_path):
+    with _repo_locks_guard:
+        return _repo_locks.setdefault(abs_repo_path, threading.Lock())
+
+def run_git(args, cwd):
+    return subprocess.run([GIT_PATH] + args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          text=True, encoding='utf-8', errors='ignore', env=GIT_ENV)
+
+def ensure_safe_directory(abs_repo_path):
+    """Ajoute le dépôt à safe.directory, une fois par dépôt et par exécution."""
+    with _repo_locks_guard:
+        if abs_repo_path in _safe_directories:
+            return
+        _safe_directories.add(abs_repo_path)
         try:
-            with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print(f"Avertissement : Le fichier cache '{CACHE_FILE}' est corrompu. Un nouveau cache sera créé.")
-            return {}
-    return {}
+            config_result = run_git(["config", "--global", "--add", "safe.directory", abs_repo_path], None)
+            # Si safe.directory existe déjà, la commande peut retourner 5. On l'ignore.
+            if config_result.returncode not in (0, 5):
+                print(f"    Avertissement lors de 'git config safe.directory': RC={config_result.returncode}, {config_result.stderr.strip()}")
+        except Exception as e_conf:
+            print(f"    Avertissement lors de la config safe.directory : {e_conf}")
+
+def add_worktree(abs_repo_path, commit_sha, worktree_path):
+    """
+    Extrait le commit dans un worktree détaché ; si le commit est inconnu, un fetch
+    puis un second essai. Renvoie le message d'erreur git, ou None en cas de succès.
+    """
+    with repo_lock(abs_repo_path):
+        if os.path.exists(worktree_path):  # reste d'une exécution interrompue
+            shutil.rmtree(worktree_path, onerror=handle_remove_readonly)
+        run_git(["worktree", "prune"], abs_repo_path)
+        add_command = ["worktree", "add", "--detach", worktree_path, str(commit_sha)]
+        result = run_git(add_command, abs_repo_path)
+        if result.returncode == 0:
+            return None
+        print(f"    ❌ Erreur lors de l'extraction du commit {commit_sha} : {result.stderr.strip()}")
+        print(f"    Tentative de `git fetch`...")
+        run_git(["fetch", "origin", "--tags", "--force", "--prune"], abs_repo_path)
+        result = run_git(add_command, abs_repo_path)
+        return None if result.returncode == 0 else result.stderr.strip()
+
+def remove_worktree(abs_repo_path, worktree_path):
+    with repo_lock(abs_repo_path):
+        result = run_git(["worktree", "remove", "--force", worktree_path], abs_repo_path)
+        if result.returncode != 0 or os.path.exists(worktree_path):
+            shutil.rmtree(worktree_path, ignore_errors=False, onerror=handle_remove_readonly)
+            run_git(["worktree", "prune"], abs_repo_path)
+
+def map_report_paths(report, snapshot_path, abs_repo_path):
+    """
+    snyk écrit les chemins absolus du dossier scanné et reprend son nom comme nom de
+    projet : dans le rapport, le worktree (ou snapshot) redevient le dépôt, comme
+    lorsque le scan tournait dans le clone.
+    """
+    if not os.path.exists(report):
+        return
+    with open(report, "r", encoding="utf-8", errors="ignore") as f:
+        content = f.read()
+    mapped = content
+    for old, new in ((snapshot_path, abs_repo_path), (os.path.basename(snapshot_path), os.path.basename(abs_repo_path))):
+        mapped = mapped.replace(json.dumps(old)[1:-1], json.dumps(new)[1:-1])
+    if mapped != content:
+        with open(report, "w", encoding="utf-8") as f:
+            f.write(mapped)
 
-def save_scan_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2)
+def tree_fingerprints(abs_repo_path, commit_sha):
+    """
+    Empreintes du commit par type de scan, sans l'extraire : 'code' d'après l'arbre
+    complet (`git rev-parse <sha>^{tree}`), 'iac' d'après les entrées `git ls-tree`
+    (mode, blob, chemin) des fichiers IAC_EXTENSIONS et SNAPSHOT_ALWAYS. Le chemin du
+    dépôt en fait partie : un rapport (chemins, nom de projet) n'est repris que dans
+    son dépôt. None si le commit est inconnu du clone local.
+    """
+    tree = run_git(["rev-parse", "--verify", "-q", f"{commit_sha}^{{tree}}"], abs_repo_path)
+    listing = run_git(["ls-tree", "-r", "-z", "--full-tree", str(commit_sha)], abs_repo_path)
+    if tree.returncode != 0 or listing.returncode != 0:
+        return None
+    code = hashlib.blake2b(f"{abs_repo_path}\0code\0{tree.stdout.strip()}".encode(), digest_size=20)
+    iac = hashlib.blake2b(f"{abs_repo_path}\0iac\0{IAC_EXTENSIONS!r}{SNAPSHOT_ALWAYS!r}".encode(), digest_size=20)
+    for entry in listing.stdout.split("\0"):
+        path = entry.partition("\t")[2]
+        if path in SNAPSHOT_ALWAYS or path.lower().endswith(IAC_EXTENSIONS):
+            iac.update(entry.encode() + b"\0")
+    return {"code": code.hexdigest(), "iac": iac.hexdigest()}
 
-scan_cache = load_scan_cache()
+def _chunks(paths):
+    for start in range(0, len(paths), GIT_PATHS_PER_CALL):
+        yield paths[start:start + GIT_PATHS_PER_CALL]
+
+def scope_entries(abs_repo_path, commit_sha):
+    """
+    Entrées `git ls-tree` (mode, type, blob, chemin) du snapshot restreint du commit,
+    triées. None si le commit est inconnu, liste vide s'il ne modifie aucun fichier.
+    """
+    diff = run_git(["diff-tree", "--no-commit-id", "-r", "-z", "--name-only", "--diff-filter=d", "--root",
+                    str(commit_sha)], abs_repo_path)
+    if diff.returncode != 0:
+        return None
+    touched = [path for path in diff.stdout.split("\0") if path]
+    if not touched:
+        return []
+    folders = {os.path.dirname(path) for path in touched if path.lower().endswith(IAC_EXTENSIONS)}
+    # "dossier/" liste le contenu direct du dossier, "." celui de la racine
+    pathspecs = touched + [f"{folder}/" if folder else "." for folder in sorted(folders)] + list(SNAPSHOT_ALWAYS)
+    entries = set()
+    for chunk in _chunks(pathspecs):
+        result = run_git(["ls-tree", "-z", str(commit_sha), "--"] + chunk, abs_repo_path)
+        if result.returncode != 0:
+            return None
+        for entry in result.stdout.split("\0"):
+            meta, _, path = entry.partition("\t")
+            if meta.split(" ")[1:2] != ["blob"]:
+                continue
+            if path in touched or path in SNAPSHOT_ALWAYS or path.lower().endswith(IAC_EXTENSIONS):
+                entries.add(entry)
+    return sorted(entries)
+
+def materialize_snapshot(abs_repo_path, commit_sha, entries, snapshot_path):
+    """Écrit les fichiers des entrées, à leur chemin dans le dépôt, via `git archive`. Renvoie l'erreur ou None."""
+    if os.path.exists(snapshot_path):  # reste d'une exécution interrompue
+        shutil.rmtree(snapshot_path, onerror=handle_remove_readonly)
+    os.makedirs(snapshot_path)
+    paths = [entry.partition("\t")[2] for entry in entries]
+    for chunk in _chunks(paths):
+        process = subprocess.Popen([GIT_PATH, "archive", "--format=tar", str(commit_sha), "--"] + chunk,
+                                   cwd=abs_repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=GIT_ENV)
+        try:
+            with tarfile.open(fileobj=process.stdout, mode="r|") as archive:
+                archive.extractall(snapshot_path, filter="data")
+        except tarfile.TarError as e:
+            process.kill()
+            process.wait()
+            return str(e)
+        stderr = process.stderr.read().decode("utf-8", errors="ignore")
+        if process.wait() != 0:
+            return stderr.strip()
+    return None
 
 # === SCAN ===
-def run_snyk_scan_on_commit(repo_folder_name, commit_sha):
+_SCOPE_A_CALCULER = object()
+
+def report_paths(repo_folder_name, commit_sha):
+    # Utiliser repo_folder_name pour le nom de fichier de sortie, après nettoyage
+    output_repo_name_cleaned = repo_folder_name.replace("/", "_").replace("\\", "_")
+    return {scan_type: os.path.join(OUTPUT_DIR, f"snyk-{scan_type}-{output_repo_name_cleaned}-{str(commit_sha)[:7]}.json")
+            for scan_type in SCAN_TYPES}
+
+def run_snyk_scan_on_commit(repo_folder_name, commit_sha, scope=_SCOPE_A_CALCULER):
+    """
+    Scanne le commit dans un worktree temporaire. `scope` : entrées du snapshot
+    restreint déjà calculées par scope_entries (calculées ici sinon). Renvoie True
+    si snyk a été lancé (False : déjà scanné, ignoré ou extraction impossible).
+    """
     short_sha = str(commit_sha)[:7]
     abs_repo_path = os.path.abspath(os.path.join(REPOS_PARENT_DIR, repo_folder_name))
-    
-    repo_cache = scan_cache.get(abs_repo_path, {})
-    sha_cache = repo_cache.get(str(commit_sha), {})
+    state = scan_state.commit_state(state_conn(), abs_repo_path, commit_sha)
 
-    # Utiliser repo_folder_name pour le nom de fichier de sortie, après nettoyage
     output_repo_name_cleaned = repo_folder_name.replace("/", "_").replace("\\", "_")
-    code_output = os.path.join(OUTPUT_DIR, f"snyk-code-{output_repo_name_cleaned}-{short_sha}.json")
-    iac_output = os.path.join(OUTPUT_DIR, f"snyk-iac-{output_repo_name_cleaned}-{short_sha}.json")
+    outputs = report_paths(repo_folder_name, commit_sha)
 
-    if sha_cache.get("code_scanned_successfully") and sha_cache.get("iac_scanned_successfully"):
+    if all(state["scanned"].get(scan_type) for scan_type in SCAN_TYPES):
         print(f"✅ Déjà scanné avec succès : {repo_folder_name}@{short_sha}")
-        return
-    if sha_cache.get("checkout_error"):
-        print(f"⚠️  Checkout précédemment échoué pour {repo_folder_name}@{short_sha}. Scan ignoré. Erreur: {sha_cache.get('checkout_error')}")
-        return
-    if sha_cache.get("repo_not_found_locally"):
+        return False
+    if state["checkout_error"]:
+        print(f"⚠️  Checkout précédemment échoué pour {repo_folder_name}@{short_sha}. Scan ignoré. Erreur: {state['checkout_error']}")
+        return False
+    if state["repo_not_found"]:
         print(f"⚠️  Dépôt {repo_folder_name} marqué comme non trouvé localement. Scan ignoré.")
-        return
+        return False
 
     if not os.path.isdir(abs_repo_path) or not os.path.isdir(os.path.join(abs_repo_path, ".git")):
         print(f"❌ Dépôt '{repo_folder_name}' non trouvé à '{abs_repo_path}' ou n'est pas un dépôt Git valide. Scan ignoré.")
-        scan_cache.setdefault(abs_repo_path, {}).setdefault(str(commit_sha), {})
-        scan_cache[abs_repo_path][str(commit_sha)]["repo_not_found_locally"] = True
-        scan_cache[abs_repo_path][str(commit_sha)]["code_scanned_successfully"] = False
-        scan_cache[abs_repo_path][str(commit_sha)]["iac_scanned_successfully"] = False
-        return
+        scan_state.mark_commit(state_conn(), abs_repo_path, commit_sha, repo_not_found=True)
+        return False
 
-    print(f"📂 Utilisation du dépôt local : {abs_repo_path}")
-    
-    clean_env = os.environ.copy()
-    for git_var in ['GIT_DIR', 'GIT_WORK_TREE', 'GIT_INDEX_FILE', 'GIT_ALTERNATE_OBJECT_DIRECTORIES', 'GIT_OBJECT_DIRECTORY']:
-        if git_var in clean_env:
-            del clean_env[git_var]
+    print(f"📂 {repo_folder_name}@{short_sha} : dépôt local {abs_repo_path}")
+    ensure_safe_directory(abs_repo_path)
 
-    try:
-        print(f"    Configuration de safe.directory pour '{abs_repo_path}'...")
-        config_command = [GIT_PATH, "config", "--global", "--add", "safe.directory", abs_repo_path]
-        config_result = subprocess.run(config_command, capture_output=True, text=True, check=False, encoding='utf-8', errors='ignore', env=clean_env)
-        if config_result.returncode != 0:
-            # Si safe.directory existe déjà, la commande peut retourner 5. On l'ignore.
-            if config_result.returncode == 5:
-                 print(f"    Info: '{abs_repo_path}' est probablement déjà dans safe.directory.")
-            else:
-                 print(f"    Avertissement lors de 'git config safe.directory': RC={config_result.returncode}, {config_result.stderr.strip()}")
-    except Exception as e_conf:
-         print(f"    Avertissement lors de la config safe.directory : {e_conf}")
+    worktree_path = os.path.join(WORKTREE_DIR, f"{output_repo_name_cleaned}-{commit_sha}")
+    if not SCOPED_SNAPSHOTS:
+        scope = None
+    elif scope is _SCOPE_A_CALCULER:
+        scope = scope_entries(abs_repo_path, commit_sha)
+    if scope:
+        snapshot_error = materialize_snapshot(abs_repo_path, commit_sha, scope, worktree_path)
+        if snapshot_error is not None:
+            print(f"    Snapshot restreint impossible pour {repo_folder_name}@{short_sha} ({snapshot_error}), extraction complète")
+            shutil.rmtree(worktree_path, onerror=handle_remove_readonly)
+            scope = None
+    if not scope:
+        checkout_error_msg = add_worktree(abs_repo_path, commit_sha, worktree_path)
+        if checkout_error_msg is not None:
+            print(f"    ❌ Échec de l'extraction de {repo_folder_name}@{short_sha} même après fetch : {checkout_error_msg}")
+            scan_state.mark_commit(state_conn(), abs_repo_path, commit_sha, checkout_error=checkout_error_msg)
+            return False
+    scan_state.mark_commit(state_conn(), abs_repo_path, commit_sha)
+    if scope:
+        print(f"    Snapshot restreint de {repo_folder_name}@{short_sha} ({len(scope)} fichiers) dans {worktree_path}")
+    else:
+        print(f"    Commit {repo_folder_name}@{short_sha} extrait dans {worktree_path}")
 
+    # Les scans restants tournent en même temps sur le worktree, que git ne touche plus
+    # jusqu'à sa suppression ; l'état n'est enregistré qu'une fois tous les scans finis
+    pending = [scan_type for scan_type in SCAN_TYPES if not state["scanned"].get(scan_type)]
     try:
-        print(f"    Nettoyage du dépôt avant checkout...")
-        subprocess.run([GIT_PATH, "reset", "--hard", "HEAD"], cwd=abs_repo_path, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=clean_env)
-        subprocess.run([GIT_PATH, "clean", "-fdx"], cwd=abs_repo_path, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=clean_env)
-        print(f"    Nettoyage terminé.")
-    except subprocess.CalledProcessError as e:
-        print(f"⚠️  Avertissement lors du nettoyage du dépôt {repo_folder_name}: {e.stderr.decode('utf-8', errors='ignore') if e.stderr else e.stdout.decode('utf-8', errors='ignore')}")
-
-    print(f"    Checkout du commit : {commit_sha}...")
-    checkout_command = [GIT_PATH, "checkout", "-f", str(commit_sha)]
-    checkout_result = subprocess.run(checkout_command, cwd=abs_repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors='ignore', env=clean_env)
-    
-    scan_cache.setdefault(abs_repo_path, {}).setdefault(str(commit_sha), {})
-
-    if checkout_result.returncode != 0:
-        checkout_error_msg = checkout_result.stderr.strip()
-        print(f"    ❌ Erreur lors du checkout du commit {commit_sha} : {checkout_error_msg}")
-        print(f"    Tentative de `git fetch`...")
-        fetch_command = [GIT_PATH, "fetch", "origin", "--tags", "--force", "--prune"]
-        subprocess.run(fetch_command, cwd=abs_repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=clean_env)
-        
-        checkout_result_after_fetch = subprocess.run(checkout_command, cwd=abs_repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors='ignore', env=clean_env)
-        if checkout_result_after_fetch.returncode != 0:
-            error_msg_after_fetch = checkout_result_after_fetch.stderr.strip()
-            print(f"    ❌ Échec du checkout même après fetch : {error_msg_after_fetch}")
-            scan_cache[abs_repo_path][str(commit_sha)]["checkout_error"] = error_msg_after_fetch
-            scan_cache[abs_repo_path][str(commit_sha)]["code_scanned_successfully"] = False
-            scan_cache[abs_repo_path][str(commit_sha)]["iac_scanned_successfully"] = False
-            return 
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            for scan_type in pending:
+                print(f"⚙️  Scan Snyk {scan_type.upper()} pour {output_repo_name_cleaned}@{short_sha}...")
+            futures = {scan_type: pool.submit(safe_run_snyk_command, SCAN_TYPES[scan_type], outputs[scan_type], worktree_path)
+                       for scan_type in pending}
+        results = {scan_type: future.result() for scan_type, future in futures.items()}
+        for scan_type in pending:
+            map_report_paths(outputs[scan_type], worktree_path, abs_repo_path)
+        scan_state.record_scans(state_conn(), abs_repo_path, commit_sha, results)
+        for scan_type, success in results.items():
+            if not success: print(f"    ⚠️  Échec Snyk {scan_type.upper()} pour {output_repo_name_cleaned}@{short_sha}. Voir {outputs[scan_type]}")
+    finally:
+        if scope:
+            shutil.rmtree(worktree_path, onerror=handle_remove_readonly)
         else:
-            print(f"    Checkout de {commit_sha} réussi après fetch.")
-            if "checkout_error" in scan_cache[abs_repo_path][str(commit_sha)]:
-                del scan_cache[abs_repo_path][str(commit_sha)]["checkout_error"]
-    else:
-        print(f"    Checkout de {commit_sha} réussi.")
-        if "checkout_error" in scan_cache[abs_repo_path][str(commit_sha)]:
-            del scan_cache[abs_repo_path][str(commit_sha)]["checkout_error"]
-    
-    sha_cache = scan_cache.get(abs_repo_path, {}).get(str(commit_sha), {})
-
-    if not sha_cache.get("checkout_error"):
-        code_scan_status = sha_cache.get("code_scanned_successfully")
-        if code_scan_status is None or not code_scan_status:
-            print(f"⚙️  Scan Snyk CODE pour {output_repo_name_cleaned}...")
-            snyk_code_success = safe_run_snyk_command(["code", "test", "--json"], code_output, cwd=abs_repo_path)
-            scan_cache[abs_repo_path][str(commit_sha)]["code_scanned_successfully"] = snyk_code_success
-            if not snyk_code_success: print(f"    ⚠️  Échec Snyk Code pour {output_repo_name_cleaned}@{short_sha}. Voir {code_output}")
-
-        sha_cache = scan_cache.get(abs_repo_path, {}).get(str(commit_sha), {}) # Recharger pour l'état du scan de code
-        iac_scan_status = sha_cache.get("iac_scanned_successfully")
-        if iac_scan_status is None or not iac_scan_status:
-            print(f"⚙️  Scan Snyk IaC pour {output_repo_name_cleaned}...")
-            snyk_iac_success = safe_run_snyk_command(["iac", "test", "--json"], iac_output, cwd=abs_repo_path)
-            scan_cache[abs_repo_path][str(commit_sha)]["iac_scanned_successfully"] = snyk_iac_success
-            if not snyk_iac_success: print(f"    ⚠️  Échec Snyk IaC pour {output_repo_name_cleaned}@{short_sha}. Voir {iac_output}")
-    else:
-        print(f"    Scan Snyk ignoré pour {output_repo_name_cleaned}@{short_sha} en raison d'une erreur de checkout.")
+            remove_worktree(abs_repo_path, worktree_path)
+    return True
+
+
+def commit_fingerprints(repo_folder_name, commit_sha):
+    """(entrées du snapshot restreint, empreintes par type de scan) ; les entrées sont reprises par le scan."""
+    abs_repo_path = os.path.abspath(os.path.join(REPOS_PARENT_DIR, repo_folder_name))
+    if not os.path.isdir(os.path.join(abs_repo_path, ".git")):
+        return _SCOPE_A_CALCULER, None
+    ensure_safe_directory(abs_repo_path)
+    scope = scope_entries(abs_repo_path, commit_sha) if SCOPED_SNAPSHOTS else None
+    if scope:
+        # Le rapport d'un snapshot restreint dépend de ses seuls fichiers, quel que soit le type de scan
+        empreinte = hashlib.blake2b(f"{abs_repo_path}\0scoped".encode(), digest_size=20)
+        for entry in scope:
+            empreinte.update(entry.encode() + b"\0")
+        return scope, {scan_type: empreinte.hexdigest() for scan_type in SCAN_TYPES}
+    return scope, tree_fingerprints(abs_repo_path, commit_sha)
+
+def reuse_tree_reports(repo_folder_name, commit_sha, fingerprints):
+    """Recopie les rapports déjà obtenus pour les empreintes du commit ; renvoie les types de scan repris."""
+    abs_repo_path = os.path.abspath(os.path.join(REPOS_PARENT_DIR, repo_folder_name))
+    conn = state_conn()
+    scanned = scan_state.commit_state(conn, abs_repo_path, commit_sha)["scanned"]
+    outputs = report_paths(repo_folder_name, commit_sha)
+    reused = {}
+    for scan_type, tree_hash in fingerprints.items():
+        if scan_type not in SCAN_TYPES or scanned.get(scan_type):
+            continue
+        report = scan_state.tree_reports(conn, tree_hash).get(scan_type)
+        if report and os.path.exists(report):
+            if os.path.abspath(report) != os.path.abspath(outputs[scan_type]):
+                shutil.copyfile(report, outputs[scan_type])
+            reused[scan_type] = True
+    if reused:
+        scan_state.record_scans(conn, abs_repo_path, commit_sha, reused)
+    return list(reused)
+
+def scan_tree_group(group):
+    """
+    Scanne l'un après l'autre les commits de même empreinte iac (voir scan_commits) :
+    chaque scan réussi est enregistré sous l'empreinte de son type, les commits
+    suivants reprennent le rapport iac, et le rapport code quand leur arbre est le même.
+    Renvoie (commits scannés, commits repris).
+    """
+    scanned = reused = 0
+    for repo, sha, scope, fingerprints in group:
+        if fingerprints is not None:
+            reused_types = reuse_tree_reports(repo, sha, fingerprints)
+            if reused_types:
+                reused += 1
+                print(f"♻️  {repo}@{sha[:7]} : rapports {', '.join(reused_types)} repris d'un commit de même empreinte")
+        scanned += bool(run_snyk_scan_on_commit(repo, sha, scope))
+        if fingerprints is not None:
+            abs_repo_path = os.path.abspath(os.path.join(REPOS_PARENT_DIR, repo))
+            done = scan_state.commit_state(state_conn(), abs_repo_path, sha)["scanned"]
+            for scan_type, report in report_paths(repo, sha).items():
+                if scan_type in fingerprints and done.get(scan_type) and os.path.exists(report):
+                    scan_state.record_tree_reports(state_conn(), fingerprints[scan_type], {scan_type: report})
+    return scanned, reused
+
+
+def scan_commits(commits, workers=SCAN_WORKERS):
+    """
+    Scanne les (dossier du dépôt, sha) avec au plus `workers` commits en cours, tous
+    dépôts confondus. Les commits sont enregistrés dans la base, qui donne ceux qui
+    restent à scanner ; chaque commit y est enregistré dès qu'il est terminé. Les
+    commits d'un dépôt de même empreinte iac (tree_fingerprints) forment une seule
+    tâche : l'empreinte code, plus fine, ne peut être partagée qu'entre eux.
+    """
+    conn = state_conn()
+    imported = scan_state.import_json_cache(conn, CACHE_FILE, SCAN_TYPES)
+    if imported:
+        print(f"{imported} commits repris de l'ancien cache {CACHE_FILE}")
+    requested = {}  # (chemin absolu du dépôt, sha) -> dossier
+    for repo, sha in commits:
+        requested.setdefault((os.path.abspath(os.path.join(REPOS_PARENT_DIR, repo)), sha), repo)
+    scan_state.add_commits(conn, requested)
+    # Chaque commit n'y apparaît qu'une fois : listé deux fois, il partagerait son worktree
+    commits = [(requested[key], key[1]) for key in map(tuple, scan_state.pending_commits(conn, list(SCAN_TYPES)))
+               if key in requested]
+    print(f"{len(commits)} commits à scanner sur {len(requested)} demandés (les autres sont déjà scannés ou en erreur)")
+    os.makedirs(WORKTREE_DIR, exist_ok=True)
+    started = time.perf_counter()
+    done = scanned = reused = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        groups = {}  # empreinte iac (ou commit sans empreinte) -> [(dossier, sha, snapshot restreint, empreintes)]
+        for (repo, sha), (scope, fingerprints) in zip(commits, pool.map(lambda commit: commit_fingerprints(*commit), commits)):
+            key = fingerprints["iac"] if fingerprints and "iac" in fingerprints else (repo, sha)
+            groups.setdefault(key, []).append((repo, sha, scope, fingerprints))
+        print(f"{len(groups)} empreintes iac distinctes pour {len(commits)} commits")
+
+        futures = {pool.submit(scan_tree_group, group): group for group in groups.values()}
+        for future in as_completed(futures):
+            group = futures[future]
+            repo, sha, _, _ = group[0]
+            done += len(group)
+            try:
+                group_scanned, group_reused = future.result()
+                scanned += group_scanned
+                reused += group_reused
+            except Exception as e:
+                print(f"    ❌ Exception Python lors du scan de {repo}@{sha[:7]} : {e}")
+            minutes = (time.perf_counter() - started) / 60
+            others = f" (+{len(group) - 1} de même empreinte)" if len(group) > 1 else ""
+            print(f"\n🟦 [{done}/{len(commits)}] {repo}@{sha[:7]}{others} terminé | {scanned / minutes:.1f} scans/min")
+
+    minutes = (time.perf_counter() - started) / 60
+    print(f"\n⏱️  {scanned} commits scannés en {minutes:.1f} min ({scanned / minutes if minutes else 0:.1f} scans/min, {workers} en parallèle), "
+          f"{reused} repris par empreinte")
 
 
 # === EXECUTION ===
@@ -262,6 +519,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     total = len(df)
+    commits = []
     for i, row in df.iterrows():
         repo_folder = row[REPO_FOLDER_NAME_COLUMN]
         sha = row[COMMIT_SHA_COLUMN]
@@ -270,11 +528,8 @@ if __name__ == "__main__":
             print(f"\n🟦 [{i+1}/{total}] Ligne ignorée : Nom du dossier ou SHA manquant/invalide.")
             continue
             
-        repo_folder_str = str(repo_folder).strip()
-        sha_str = str(sha).strip()
-        
-        print(f"\n🟦 [{i+1}/{total}] Dossier Dépôt : {repo_folder_str} | Commit : {sha_str}")
-        run_snyk_scan_on_commit(repo_folder_str, sha_str)
-        save_scan_cache(scan_cache)
+        commits.append((str(repo_folder).strip(), str(sha).strip()))
+
+    scan_commits(commits)
 
-    print("\n✅ Tous les scans (ou tentatives de scan) terminés.")
\ No newline at end of file
+    print("\n✅ Tous les scans (ou tentatives de scan) terminés.")